@@ -1,8 +1,19 @@
+import threading
+from collections import OrderedDict
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from io import StringIO
-from scipy import stats
+import plotly.graph_objects as go
+
+from utils.aggregates import (count_by, dimension_counts, filter_segments, from_day_index, group_moments, histogram_counts,
+                              segment_statistics, to_day_index)
+from utils.anomaly import AnomalyDetector
+from utils.index import row_positions, select_rows, sorted_positions
+from utils.inference import bootstrap_means, welch_test
+from utils.store import DatasetStore
+from utils.summaries import box_summary, density_grid, outlier_positions, stratified_sample
+from utils.timeseries import GRANULARITIES, booking_series, choose_granularity, downsample
 
 # Configuração da página
 st.set_page_config(
@@ -41,39 +52,72 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Funções de Pré-processamento e Gráficos 
-@st.cache_data
+@st.cache_resource
+def get_dataset_store():
+    """Armazenamento do dataset compartilhado por todas as sessões."""
+    return DatasetStore()
+
+# Acima desse número de corridas, o gráfico de dispersão mostra densidade ou amostra em vez de todos os pontos
+SCATTER_MAX_POINTS = 5000
+
+# Status considerados "cancelados/incompletos" no teste de hipótese
+CANCELLED_STATUSES = ['Cancelled by Customer', 'Cancelled by Driver', 'Incomplete']
+
+# Resultados do bootstrap compartilhados entre sessões, por versão dos dados e assinatura dos filtros
+BOOTSTRAP_CACHE_SIZE = 32
+
+@st.cache_resource
+def get_bootstrap_cache():
+    return threading.Lock(), OrderedDict()
+
+# Função para calcular (ou buscar no cache) o bootstrap. A barra de progresso é atualizada a cada
+# tarefa concluída; se o usuário aplicar novos filtros no meio do cálculo, o Streamlit interrompe
+# a execução nessa atualização e as tarefas restantes são canceladas.
+def run_bootstrap(dataset, day_range, vehicle_types, booking_status, n_resamples):
+    key = (dataset.version, day_range, tuple(vehicle_types), tuple(booking_status), n_resamples)
+    lock, cache = get_bootstrap_cache()
+    with lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+    # Só a coluna de distância é lida para as linhas de cada grupo
+    distances = dataset.df['Ride Distance'].to_numpy()
+    groups = {}
+    for name, statuses in (('Completada', ['Completed']), ('Cancelada/Incompleta', CANCELLED_STATUSES)):
+        groups[name] = distances[select_rows(dataset.index, day_range, {
+            'Vehicle Type': list(vehicle_types),
+            'Booking Status': [status for status in booking_status if status in statuses],
+        })]
+    progress_bar = st.progress(0.0, text="Calculando o bootstrap...")
+    result = bootstrap_means(
+        groups, n_resamples, confidence=0.9,
+        progress=lambda done: progress_bar.progress(done, text="Calculando o bootstrap...")
+    )
+    progress_bar.empty()
+
+    with lock:
+        cache[key] = result
+        while len(cache) > BOOTSTRAP_CACHE_SIZE:
+            cache.popitem(last=False)
+    return result
+
+# Detectores de anomalias compartilhados entre sessões e mantidos entre recargas dos dados: quando
+# novos dias chegam, só os pontos novos da série são processados. O fim do período não entra na
+# chave para que a série estendida (ou encurtada) reaproveite o mesmo detector.
+@st.cache_resource(max_entries=64)
+def get_anomaly_detector(granularity, vehicle_types, booking_status, first_day):
+    return AnomalyDetector(granularity)
+
 def load_data_and_preprocess():
     """Carrega e pré-processa o dataset, garantindo o formato correto dos dados."""
     try:
-        df = pd.read_csv('data/ncr_ride_bookings.csv')
-        
-        # Cópia do DataFrame original para a comparação "antes"
-        raw_df = df.copy()
-        
-        # Conversão de tipos de dados para garantir que os cálculos funcionem
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-        df['Hour'] = pd.to_datetime(df['Time'], format='%H:%M:%S', errors='coerce').dt.hour
-        
-        # Tratar colunas numéricas que podem estar como string
-        numeric_cols = ['Booking Value', 'Ride Distance', 'Avg VTAT', 'Avg CTAT', 'Cancelled Rides by Customer', 
-                        'Cancelled Rides by Driver', 'Incomplete Rides', 'Driver Ratings', 'Customer Rating']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        # Preencher valores ausentes para evitar erros nos gráficos e métricas
-        for col in df.columns:
-            if df[col].isnull().sum() > 0:
-                if df[col].dtype in ['int64', 'float64']:
-                    median_val = df[col].median()
-                    df[col].fillna(median_val, inplace=True)
-                else:
-                    mode_val = df[col].mode()[0]
-                    df[col].fillna(mode_val, inplace=True)
-                    
-        return raw_df, df
+        # O resultado do pré-processamento e os agregados ficam salvos em `data/.cache`; somente
+        # arquivos novos ou alterados em `data/` são processados. Todas as sessões recebem o mesmo
+        # objeto (somente leitura), que é trocado em segundo plano quando os arquivos mudam.
+        return get_dataset_store().current()
     except FileNotFoundError:
-        st.error("O arquivo `ncr_ride_bookings.csv` não foi encontrado. Por favor, verifique se o arquivo está no diretório `data/`.")
+        st.error("O arquivo `ncr_ride_bookings.csv` (ou `.csv.gz`/`.csv.zst`) não foi encontrado. Por favor, verifique se o arquivo está no diretório `data/`.")
         st.stop()
     except Exception as e:
         st.error(f"Erro ao carregar ou processar os dados: {e}")
@@ -117,18 +161,22 @@ def create_bar_chart(data, x, y, title, color=None):
     return fig
 
 # Função para criar histograma
-def create_histogram(data, x, title, nbins=30):
-    fig = px.histogram(
+# As faixas já vêm contadas (`histogram_counts`): só centros, limites e contagens vão para o navegador
+def create_histogram(data, x, title):
+    fig = px.bar(
         data, 
         x=x, 
+        y='count',
         title=title,
-        nbins=nbins,
+        hover_data={'start': ':.2f', 'end': ':.2f'},
         color_discrete_sequence=['#2A9D8F', '#E9C46A', '#F4A261', '#E76F51', '#264653']
     )
+    fig.update_traces(width=(data['end'] - data['start']).to_numpy())
     fig.update_layout(
         font=dict(size=12),
         title_font_size=16,
-        height=400
+        height=400,
+        bargap=0
     )
     return fig
 
@@ -148,184 +196,434 @@ def create_time_series(data, x, y, title):
     )
     return fig
 
+# Função para criar o mapa de densidade (grade calculada no servidor) com os outliers por cima
+def create_density_chart(counts, x_centers, y_centers, outliers, x, y, title):
+    fig = go.Figure(go.Heatmap(
+        z=counts,
+        x=x_centers,
+        y=y_centers,
+        colorscale=[[0, '#FFFFFF'], [1, '#2A9D8F']],
+        colorbar=dict(title='Corridas'),
+        hovertemplate=f'{x}: %{{x:.2f}}<br>{y}: %{{y:.2f}}<br>Corridas: %{{z}}<extra></extra>'
+    ))
+    fig.add_trace(go.Scattergl(
+        x=outliers[x],
+        y=outliers[y],
+        mode='markers',
+        name='Outliers',
+        marker=dict(color='#E76F51', size=4)
+    ))
+    fig.update_layout(
+        title=title,
+        xaxis_title=x,
+        yaxis_title=y,
+        font=dict(size=12),
+        title_font_size=16,
+        height=400
+    )
+    return fig
+
+# Função para criar o box plot a partir das estatísticas calculadas no servidor (`box_summary`)
+def create_box_plot(summary, name, title, color='#E76F51'):
+    fig = go.Figure(go.Box(
+        x=[name],
+        q1=[summary['q1']],
+        median=[summary['median']],
+        q3=[summary['q3']],
+        lowerfence=[summary['lower_whisker']],
+        upperfence=[summary['upper_whisker']],
+        mean=[summary['mean']],
+        name=name,
+        marker_color=color,
+        boxpoints=False
+    ))
+    fig.add_trace(go.Scattergl(
+        x=[name] * len(summary['outliers']),
+        y=summary['outliers'],
+        mode='markers',
+        name='Outliers',
+        marker=dict(color=color, size=4)
+    ))
+    fig.update_layout(
+        title=title,
+        yaxis_title=name,
+        showlegend=False,
+        font=dict(size=12),
+        title_font_size=16,
+        height=400
+    )
+    return fig
+
+# Fragmentos com controles próprios: mudar esses controles reexecuta só o gráfico correspondente
+# Fragmento da tendência de reservas (granularidade e camada de anomalias)
+@st.fragment
+def render_booking_trend(segments, cube, day_range, vehicle_types, booking_status, days):
+    granularity = st.selectbox(
+        "Granularidade:",
+        ['auto', *GRANULARITIES],
+        format_func=lambda g: GRANULARITIES.get(g, "Automática")
+    )
+    if granularity == 'auto':
+        # Tamanho do período selecionado (ou de todo o dataset) define o nível de detalhe
+        first, last = day_range or (days[0], days[-1])
+        granularity = choose_granularity(last - first + 1)
+    # Séries longas são reduzidas (LTTB) para um número limitado de pontos
+    trend = booking_series(segments, cube, granularity)
+    daily_bookings = downsample(trend)
+    fig_daily = create_time_series(
+        daily_bookings, 
+        'Date', 
+        'count', 
+        ""
+    )
+    if granularity in ('hour', 'day'):
+        # Camada de anomalias sobre a série completa (antes da redução de pontos)
+        detector = get_anomaly_detector(
+            granularity, tuple(vehicle_types), tuple(booking_status), day_range[0] if day_range else None
+        )
+        anomalies = detector.update(trend)
+        fig_daily.add_scatter(
+            x=anomalies['Date'],
+            y=anomalies['count'],
+            customdata=anomalies['z'],
+            mode='markers',
+            name='Anomalia',
+            marker=dict(color='#E76F51', size=8),
+            hovertemplate='%{x}<br>Reservas: %{y}<br>z: %{customdata:.1f}<extra></extra>'
+        )
+    st.plotly_chart(fig_daily, use_container_width=True)
+    if granularity in ('hour', 'day'):
+        st.caption(f"{len(anomalies):,} pontos anômalos destacados (|z| > {detector.threshold:g} em relação à média sazonal ou móvel).")
+
+# Fragmento do gráfico de dispersão (modo de exibição para muitos pontos)
+@st.fragment
+def render_scatter(points):
+    if len(points) <= SCATTER_MAX_POINTS:
+        fig_scatter = px.scatter(
+            points,
+            x='Ride Distance',
+            y='Booking Value',
+            title='Valor da Reserva vs. Distância da Corrida',
+            color_discrete_sequence=['#2A9D8F']
+        )
+    else:
+        # Com muitos pontos, o navegador recebe só a grade de densidade ou uma amostra, sempre com os outliers
+        scatter_mode = st.radio(
+            "Exibição:",
+            ["Densidade", "Amostra"],
+            horizontal=True,
+            help=f"Com mais de {SCATTER_MAX_POINTS:,} corridas, os pontos são resumidos em uma grade de densidade ou em uma amostra estratificada; os outliers são sempre exibidos."
+        )
+        outliers = points.iloc[outlier_positions(points, ['Ride Distance', 'Booking Value'])]
+        if scatter_mode == "Densidade":
+            counts, x_centers, y_centers = density_grid(points, 'Ride Distance', 'Booking Value')
+            fig_scatter = create_density_chart(
+                counts, x_centers, y_centers, outliers,
+                'Ride Distance', 'Booking Value',
+                'Valor da Reserva vs. Distância da Corrida'
+            )
+        else:
+            sample = points.iloc[stratified_sample(points, 'Ride Distance', 'Booking Value', SCATTER_MAX_POINTS)]
+            fig_scatter = px.scatter(
+                pd.concat([sample.assign(Tipo='Amostra'), outliers.assign(Tipo='Outlier')]),
+                x='Ride Distance',
+                y='Booking Value',
+                color='Tipo',
+                title='Valor da Reserva vs. Distância da Corrida',
+                color_discrete_sequence=['#2A9D8F', '#E76F51'],
+                render_mode='webgl'
+            )
+            st.caption(f"Exibindo uma amostra estratificada de {len(sample):,} de {len(points):,} corridas, mais {len(outliers):,} outliers.")
+    st.plotly_chart(fig_scatter, use_container_width=True)
+
+# Fragmento do bootstrap (número de reamostragens e cálculo sob demanda)
+@st.fragment
+def render_bootstrap(dataset, day_range, vehicle_types, booking_status):
+    st.markdown("#### **Intervalos de Confiança por Bootstrap**")
+    st.markdown("O bootstrap reamostra as distâncias de cada grupo milhares de vezes e usa os percentis das médias obtidas como intervalo de confiança de 90%, sem supor uma distribuição para os dados.")
+    n_resamples = st.select_slider(
+        "Número de reamostragens:",
+        options=[1000, 2000, 5000, 10000, 20000],
+        value=10000
+    )
+    if st.checkbox("Calcular intervalos por bootstrap"):
+        bootstrap = run_bootstrap(dataset, day_range, vehicle_types, booking_status, n_resamples)
+        bootstrap_df = pd.DataFrame(
+            [(name, lower, upper) for name, (lower, upper) in bootstrap.items()],
+            columns=['Média', 'Limite Inferior (km)', 'Limite Superior (km)']
+        ).replace({'Média': {'difference': 'Diferença (Completada − Cancelada/Incompleta)'}})
+        st.dataframe(bootstrap_df, use_container_width=True, hide_index=True)
+
+# Ordem das linhas de uma tabela paginada, em cache por assinatura (dados e filtros) e coluna.
+# `cache_resource` devolve o mesmo array (somente leitura) a cada execução, sem serializá-lo e copiá-lo.
+@st.cache_resource(max_entries=16)
+def cached_sort_order(signature, column, ascending, _df, _rows):
+    positions = sorted_positions(_df, _rows, column, ascending)
+    positions.setflags(write=False)
+    return positions
+
+# Fragmento da tabela paginada: ordenação, colunas e página são resolvidas no servidor e só a
+# página atual (com as colunas escolhidas) é enviada ao navegador
+@st.fragment
+def render_table_pages(data, rows, signature, key):
+    columns = st.multiselect(
+        "Colunas:",
+        list(data.columns),
+        default=list(data.columns),
+        key=f'{key}_columns'
+    )
+    col_sort, col_order, col_size = st.columns([2, 1, 1])
+    with col_sort:
+        sort_column = st.selectbox(
+            "Ordenar por:",
+            [None, *data.columns],
+            format_func=lambda c: "Ordem original" if c is None else c,
+            key=f'{key}_sort'
+        )
+    with col_order:
+        ascending = st.radio("Ordem:", ["Crescente", "Decrescente"], horizontal=True, key=f'{key}_order') == "Crescente"
+    with col_size:
+        page_size = st.selectbox("Linhas por página:", [50, 100, 500], index=1, key=f'{key}_size')
+
+    positions = row_positions(rows, len(data))
+    if sort_column is not None:
+        positions = cached_sort_order(signature, sort_column, ascending, data, rows)
+    n_pages = max(1, -(-len(positions) // page_size))
+    # A chave inclui o número de páginas: quando os filtros mudam, a tabela volta para a primeira página
+    page = st.number_input(f"Página (de {n_pages:,}):", min_value=1, max_value=n_pages, value=1, key=f'{key}_page_{n_pages}')
+    start = (page - 1) * page_size
+    st.dataframe(
+        data.iloc[positions[start:start + page_size]][columns],
+        use_container_width=True,
+        height=400
+    )
+    st.caption(f"Linhas {min(start + 1, len(positions)):,}–{min(start + page_size, len(positions)):,} de {len(positions):,}.")
+
 #Carregamento de Dados 
-raw_df, df = load_data_and_preprocess()
+dataset = load_data_and_preprocess()
+if get_dataset_store().last_error is not None:
+    st.warning(f"Não foi possível recarregar os dados atualizados ({get_dataset_store().last_error}). Exibindo a versão carregada anteriormente.")
+# O relatório do pré-processamento é montado na ingestão; a aba só exibe o que já foi calculado
+report, df = dataset.report, dataset.df
+raw_profile, processed_profile, fill_values = report.raw_profile, report.processed_profile, report.fill_values
 
 # Título principal
 st.markdown('<h1 class="main-header">🚗 Dashboard de Reservas NCR</h1>', unsafe_allow_html=True)
 
 # Abas de Navegação 
+# Com `on_change="rerun"` as abas guardam qual está selecionada e só o conteúdo dela é executado
+# (`tab.open`); trocar de aba faz uma nova execução do script.
 tab_contexto, tab_preprocessamento, tab_classificacao, tab_analise, tab_conclusao = st.tabs([
     "Contexto do Projeto", "Pré-processamento", "Classificação das Variáveis", "Análise de Dados Gerais", "Conclusão"
-])
+], key='secao', on_change='rerun')
 
 # Pagina de contexto
 with tab_contexto:
-    st.header("1. Contexto do Projeto 📝")
-    st.markdown("""
-    Este dashboard interativo foi desenvolvido para analisar e visualizar dados de um serviço de reserva de viagens, a Uber, com foco em otimizar a operação e a experiência do usuário e disponibilizar uma forma de analisar os dados gerais da empresa.
+    if tab_contexto.open:
+        st.header("1. Contexto do Projeto 📝")
+        st.markdown("""
+        Este dashboard interativo foi desenvolvido para analisar e visualizar dados de um serviço de reserva de viagens, a Uber, com foco em otimizar a operação e a experiência do usuário e disponibilizar uma forma de analisar os dados gerais da empresa.
 
-    --- PERGUNTAS DE ANÁLISE ---
-    - Quais são os horários de pico de reservas?
-    - Quais são os principais motivos de cancelamento?
-    - Qual a principal forma de pagamento na India?
-    - O valor da corrida e a distância estão relacionados de que forma?
-    - A distância média das viagens completadas é igual a distância média das viagens incompletas ou canceladas?
-    - Os valores das viagens se baseiam em distância ou em outro aspecto?
+        --- PERGUNTAS DE ANÁLISE ---
+        - Quais são os horários de pico de reservas?
+        - Quais são os principais motivos de cancelamento?
+        - Qual a principal forma de pagamento na India?
+        - O valor da corrida e a distância estão relacionados de que forma?
+        - A distância média das viagens completadas é igual a distância média das viagens incompletas ou canceladas?
+        - Os valores das viagens se baseiam em distância ou em outro aspecto?
 
-    As seções a seguir detalham as etapas do projeto, desde o tratamento dos dados até a apresentação das conclusões.
+        As seções a seguir detalham as etapas do projeto, desde o tratamento dos dados até a apresentação das conclusões.
 
-    A baixo temos o dataframe puro, após ser baixado no Kaggle:
-    """)
+        A baixo temos o dataframe puro, após ser baixado no Kaggle:
+        """)
 
-    raw_df
+        raw_sample = pd.DataFrame(raw_profile['head'])
+        render_table_pages(raw_sample, slice(None), ('raw', dataset.version), 'dados_originais')
+        st.caption(f"Amostra com as primeiras {len(raw_sample):,} de {raw_profile['rows']:,} linhas do arquivo original.")
 
 # Pagina de Pre-Processamento
 with tab_preprocessamento:
-    st.header("2. Pré-processamento e Tratamento de Dados 🛠️")
-    st.markdown("""
-    A etapa de pré-processamento é a base de qualquer análise de dados confiável. Nela, garantimos a **qualidade, consistência e o formato correto** dos dados para que os cálculos e visualizações não apresentem erros.
-    Para este dashboard, realizamos as seguintes ações:
-    - **Conversão de Tipos:** Garantimos que colunas como 'Date', 'Time' e outras numéricas estejam no formato correto.
-    - **Tratamento de Dados Ausentes:** Lidamos com valores em branco (`NaN`) preenchendo-os com a mediana ou a moda para evitar falhas nos gráficos e cálculos.
-    - **Retirada de Duplicatas** Lidamos com valores duplicados retirando as duplicatas para maior eficiência dos dados.
-    """)
-    st.markdown("### Dados Antes e Depois do Tratamento 🔬")
-    st.markdown("Veja o impacto do pré-processamento. A tabela abaixo à esquerda mostra os dados com valores ausentes e os tipos originais, enquanto a tabela à direita mostra o resultado após a limpeza e conversão.")
-
-    col_before, col_after = st.columns(2)
-
-    with col_before:
-        st.markdown("#### **Antes do Tratamento**")
-        st.info("Valores nulos por coluna (antes):")
-        st.dataframe(raw_df.isnull().sum().astype(str), use_container_width=True)
-        st.info("Tipos de Dados (antes):")
-        buffer = StringIO()
-        raw_df.info(buf=buffer)
-        s = buffer.getvalue()
-        st.code(s)
-
-    with col_after:
-        st.markdown("#### **Depois do Tratamento**")
-        st.success("Valores nulos por coluna (depois):")
-        st.dataframe(df.isnull().sum().astype(str), use_container_width=True)
-        st.success("Tipos de Dados (depois):")
-        buffer = StringIO()
-        df.info(buf=buffer)
-        s = buffer.getvalue()
-        st.code(s)
-
-    st.success("Dados carregados e pré-processados com sucesso!")
+    if tab_preprocessamento.open:
+        st.header("2. Pré-processamento e Tratamento de Dados 🛠️")
+        st.markdown("""
+        A etapa de pré-processamento é a base de qualquer análise de dados confiável. Nela, garantimos a **qualidade, consistência e o formato correto** dos dados para que os cálculos e visualizações não apresentem erros.
+        Para este dashboard, realizamos as seguintes ações:
+        - **Conversão de Tipos:** Garantimos que colunas como 'Date', 'Time' e outras numéricas estejam no formato correto.
+        - **Tratamento de Dados Ausentes:** Lidamos com valores em branco (`NaN`) preenchendo-os com a mediana ou a moda para evitar falhas nos gráficos e cálculos.
+        - **Retirada de Duplicatas** Lidamos com valores duplicados retirando as duplicatas para maior eficiência dos dados.
+        """)
+        st.markdown("### Dados Antes e Depois do Tratamento 🔬")
+        st.markdown("Veja o impacto do pré-processamento. A tabela abaixo à esquerda mostra os dados com valores ausentes e os tipos originais, enquanto a tabela à direita mostra o resultado após a limpeza e conversão.")
+
+        col_before, col_after = st.columns(2)
+
+        with col_before:
+            st.markdown("#### **Antes do Tratamento**")
+            st.info("Valores nulos por coluna (antes):")
+            st.dataframe(pd.Series(raw_profile['null_counts']).astype(str), use_container_width=True)
+            st.info("Tipos de Dados (antes):")
+            st.code(raw_profile['info'])
+
+        with col_after:
+            st.markdown("#### **Depois do Tratamento**")
+            st.success("Valores nulos por coluna (depois):")
+            st.dataframe(pd.Series(processed_profile['null_counts']).astype(str), use_container_width=True)
+            st.success("Tipos de Dados (depois):")
+            st.code(processed_profile['info'])
+
+        st.markdown("#### Valores Inválidos na Conversão")
+        st.markdown("Valores presentes no arquivo original que não puderam ser convertidos para data, hora ou número e passaram a ser tratados como ausentes.")
+        st.dataframe(
+            pd.DataFrame({'Coluna': list(report.coerced_counts), 'Valores Inválidos': list(report.coerced_counts.values())}),
+            use_container_width=True,
+            hide_index=True
+        )
+
+        st.markdown("#### Valores Usados no Preenchimento")
+        st.markdown("Cada coluna com valores ausentes foi preenchida com a **mediana** (colunas numéricas) ou com a **moda** (demais colunas).")
+        st.dataframe(
+            pd.DataFrame({'Coluna': list(fill_values), 'Valor de Preenchimento': [str(v) for v in fill_values.values()]}),
+            use_container_width=True,
+            hide_index=True
+        )
+
+        st.success("Dados carregados e pré-processados com sucesso!")
 
 # Pagina de Classificação de Variaveis
 with tab_classificacao:
-    st.header("3. Classificação das Variáveis 📊")
-    st.markdown("""
-    A classificação das variáveis é um passo fundamental da análise exploratória. Entender o tipo de dado que estamos trabalhando nos ajuda a escolher os métodos estatísticos e os tipos de gráficos mais adequados.
+    if tab_classificacao.open:
+        st.header("3. Classificação das Variáveis 📊")
+        st.markdown("""
+        A classificação das variáveis é um passo fundamental da análise exploratória. Entender o tipo de dado que estamos trabalhando nos ajuda a escolher os métodos estatísticos e os tipos de gráficos mais adequados.
     
-    ### **Tipos de Variáveis**
-    - **Variáveis Qualitativas (ou Categóricas):** Representam características uma classificação por tipo ou atributo.
-        - `Nominais`: Características e atributos que não podem ser ordenados.
-        - `Ordinais`: Características e atributos que podem ser ordenados.
-
-    - **Variáveis Quantitativas (ou Numéricas):** Representam quantidades que podem ser medidas ou contadas, ou seja possuem uma escala de mensuração númerica.
-        - `Discretas`: Entre dois pontos da escala existe número finito de valores.
-        - `Contínuas`: Entre dois pontos da escala existe número infinito de valores.
-    """)
+        ### **Tipos de Variáveis**
+        - **Variáveis Qualitativas (ou Categóricas):** Representam características uma classificação por tipo ou atributo.
+            - `Nominais`: Características e atributos que não podem ser ordenados.
+            - `Ordinais`: Características e atributos que podem ser ordenados.
+
+        - **Variáveis Quantitativas (ou Numéricas):** Representam quantidades que podem ser medidas ou contadas, ou seja possuem uma escala de mensuração númerica.
+            - `Discretas`: Entre dois pontos da escala existe número finito de valores.
+            - `Contínuas`: Entre dois pontos da escala existe número infinito de valores.
+        """)
     
-    st.markdown("#### **Classificação Completa das Variáveis do Dataset**")
+        st.markdown("#### **Classificação Completa das Variáveis do Dataset**")
     
-    # Dicionário com a classificação correta e a justificativa para cada coluna do DF
-    classification_data = {
-        'Variable': [],
-        'Type': [],
-        'Justification': []
-    }
+        # Dicionário com a classificação correta e a justificativa para cada coluna do DF
+        classification_data = {
+            'Variable': [],
+            'Type': [],
+            'Justification': []
+        }
     
-    # Mapeamento completo e correto das variáveis
-    variable_info = {
-        'Date': {'type': 'Quantitativa (Contínua)', 'justification': 'A data pode ser representada numericamente e assume valores em uma escala contínua e permitindo comparações.'},
-        'Vehicle Type': {'type': 'Qualitativa (Nominal)', 'justification': 'Classifica os veículos em categorias, sem hierarquia entre eles.'},
-        'Booking ID': {'type':'ID', 'justification':'ID único para cada pedido de viagem.'},
-        'Booking Status': {'type': 'Qualitativa (Nominal)', 'justification': 'Categoriza o status das reservas, como "Completed" ou "Cancelled".'},
-        'Customer ID': {'type':'ID', 'justification':'ID único para cada usuário.'},
-        'Booking Value': {'type': 'Quantitativa (Contínua)', 'justification': 'Representa um valor monetário que pode ter casas decimais.'},
-        'Ride Distance': {'type': 'Quantitativa (Contínua)', 'justification': 'A distância percorrida é uma medida contínua, podendo ser fracionada.'},
-        'Pickup Location': {'type': 'Qualitativa (Nominal)', 'justification': 'Nomes de locais são categorias nominais, sem ordem.'},
-        'Drop Location': {'type': 'Qualitativa (Nominal)', 'justification': 'Nomes de locais são categorias nominais, sem ordem.'},
-        'Payment Method': {'type': 'Qualitativa (Nominal)', 'justification': 'Tipos de pagamento são categorias distintas, sem hierarquia.'},
-        'Reason for cancelling by Customer': {'type': 'Qualitativa (Nominal)', 'justification': 'As razões de cancelamento são rótulos categóricos.'},
-        'Driver Cancellation Reason': {'type': 'Qualitativa (Nominal)', 'justification': 'As razões de cancelamento por motorista são rótulos categóricos.'},
-        'Incomplete Rides Reason':{'type':'Qualitativa (Nominal)', 'justification':'As razões de viagens canceladas são rótulos categóricos, sem ordem.' },
-        'Trip Duration': {'type': 'Quantitativa (Contínua)', 'justification': 'A duração de uma viagem é uma medida de tempo, que pode ser contínua.'},
-        'Driver Ratings': {'type': 'Quantitativa (Discreta)', 'justification': 'São notas inteiras (ex: 1 a 5), uma contagem discreta de estrelas.'},
-        'Customer Rating': {'type': 'Quantitativa (Discreta)', 'justification': 'São notas inteiras, uma contagem discreta de estrelas.'},
-        'Cancelled Rides by Customer': {'type': 'Quantitativa (Discreta)', 'justification': 'É uma contagem de eventos de cancelamento, em números inteiros.'},
-        'Cancelled Rides by Driver': {'type': 'Quantitativa (Discreta)', 'justification': 'É uma contagem de eventos de cancelamento, em números inteiros.'},
-        'Incomplete Rides': {'type': 'Quantitativa (Discreta)', 'justification': 'É uma contagem de viagens incompletas, em números inteiros.'},
-        'Avg VTAT': {'type': 'Quantitativa (Contínua)', 'justification': 'Representa a média de tempo, que é um valor contínuo.'},
-        'Avg CTAT': {'type': 'Quantitativa (Contínua)', 'justification': 'Representa a média de tempo, que é um valor contínuo.'},
-        'Time': {'type': 'Qualitativa (Nominal)', 'justification': 'Embora represente um ponto no tempo, é usado como categoria para agrupar as viagens.'},
-        'Hour': {'type': 'Quantitativa (Contínua)', 'justification': 'É uma variável inteira derivada do tempo, sendo continuamente medida.'},
-    }
+        # Mapeamento completo e correto das variáveis
+        variable_info = {
+            'Date': {'type': 'Quantitativa (Contínua)', 'justification': 'A data pode ser representada numericamente e assume valores em uma escala contínua e permitindo comparações.'},
+            'Vehicle Type': {'type': 'Qualitativa (Nominal)', 'justification': 'Classifica os veículos em categorias, sem hierarquia entre eles.'},
+            'Booking ID': {'type':'ID', 'justification':'ID único para cada pedido de viagem.'},
+            'Booking Status': {'type': 'Qualitativa (Nominal)', 'justification': 'Categoriza o status das reservas, como "Completed" ou "Cancelled".'},
+            'Customer ID': {'type':'ID', 'justification':'ID único para cada usuário.'},
+            'Booking Value': {'type': 'Quantitativa (Contínua)', 'justification': 'Representa um valor monetário que pode ter casas decimais.'},
+            'Ride Distance': {'type': 'Quantitativa (Contínua)', 'justification': 'A distância percorrida é uma medida contínua, podendo ser fracionada.'},
+            'Pickup Location': {'type': 'Qualitativa (Nominal)', 'justification': 'Nomes de locais são categorias nominais, sem ordem.'},
+            'Drop Location': {'type': 'Qualitativa (Nominal)', 'justification': 'Nomes de locais são categorias nominais, sem ordem.'},
+            'Payment Method': {'type': 'Qualitativa (Nominal)', 'justification': 'Tipos de pagamento são categorias distintas, sem hierarquia.'},
+            'Reason for cancelling by Customer': {'type': 'Qualitativa (Nominal)', 'justification': 'As razões de cancelamento são rótulos categóricos.'},
+            'Driver Cancellation Reason': {'type': 'Qualitativa (Nominal)', 'justification': 'As razões de cancelamento por motorista são rótulos categóricos.'},
+            'Incomplete Rides Reason':{'type':'Qualitativa (Nominal)', 'justification':'As razões de viagens canceladas são rótulos categóricos, sem ordem.' },
+            'Trip Duration': {'type': 'Quantitativa (Contínua)', 'justification': 'A duração de uma viagem é uma medida de tempo, que pode ser contínua.'},
+            'Driver Ratings': {'type': 'Quantitativa (Discreta)', 'justification': 'São notas inteiras (ex: 1 a 5), uma contagem discreta de estrelas.'},
+            'Customer Rating': {'type': 'Quantitativa (Discreta)', 'justification': 'São notas inteiras, uma contagem discreta de estrelas.'},
+            'Cancelled Rides by Customer': {'type': 'Quantitativa (Discreta)', 'justification': 'É uma contagem de eventos de cancelamento, em números inteiros.'},
+            'Cancelled Rides by Driver': {'type': 'Quantitativa (Discreta)', 'justification': 'É uma contagem de eventos de cancelamento, em números inteiros.'},
+            'Incomplete Rides': {'type': 'Quantitativa (Discreta)', 'justification': 'É uma contagem de viagens incompletas, em números inteiros.'},
+            'Avg VTAT': {'type': 'Quantitativa (Contínua)', 'justification': 'Representa a média de tempo, que é um valor contínuo.'},
+            'Avg CTAT': {'type': 'Quantitativa (Contínua)', 'justification': 'Representa a média de tempo, que é um valor contínuo.'},
+            'Time': {'type': 'Qualitativa (Nominal)', 'justification': 'Embora represente um ponto no tempo, é usado como categoria para agrupar as viagens.'},
+            'Hour': {'type': 'Quantitativa (Contínua)', 'justification': 'É uma variável inteira derivada do tempo, sendo continuamente medida.'},
+            'Day Index': {'type': 'Quantitativa (Discreta)', 'justification': 'Número inteiro de dias desde 01/01/1970, derivado da data para agrupar e filtrar por dia.'},
+            'Weekday': {'type': 'Qualitativa (Ordinal)', 'justification': 'Dia da semana derivado da data (0 = segunda-feira), com ordem natural.'},
+            'Month': {'type': 'Qualitativa (Ordinal)', 'justification': 'Mês do ano derivado da data (1 a 12), com ordem natural.'},
+        }
 
-    for col in df.columns:
-        if col in variable_info:
-            classification_data['Variable'].append(col)
-            classification_data['Type'].append(variable_info[col]['type'])
-            classification_data['Justification'].append(variable_info[col]['justification'])
-        else:
-            classification_data['Variable'].append(col)
-            classification_data['Type'].append('Desconhecido')
-            classification_data['Justification'].append('Não classificado.')
+        for col in df.columns:
+            if col in variable_info:
+                classification_data['Variable'].append(col)
+                classification_data['Type'].append(variable_info[col]['type'])
+                classification_data['Justification'].append(variable_info[col]['justification'])
+            else:
+                classification_data['Variable'].append(col)
+                classification_data['Type'].append('Desconhecido')
+                classification_data['Justification'].append('Não classificado.')
     
-    classification_df = pd.DataFrame(classification_data)
+        classification_df = pd.DataFrame(classification_data)
     
-    st.dataframe(classification_df, use_container_width=True, height=810)
+        st.dataframe(classification_df, use_container_width=True, height=810)
 
 # Pagina de Analise de Dados
-with tab_analise:
+# A aba é um fragmento: filtros e gráficos reexecutam só esta função, sem refazer as demais abas
+@st.fragment
+def render_analysis():
     st.header("4. Análise dos Dados 📊")
     st.markdown("Use os filtros abaixo para segmentar os dados e realizar análises mais específicas. Esses filtros determinam os dados de todos as análises e gráficos abaixo.")
 
     # ----------------- Filtros -----------------
-    date_range = st.date_input(
-        "Selecione o período:",
-        value=(df['Date'].min().date(), df['Date'].max().date()),
-        min_value=df['Date'].min().date(),
-        max_value=df['Date'].max().date()
-    )
-    
-    col_multi_1, col_multi_2 = st.columns(2)
-
-    with col_multi_1:
-        vehicle_types = st.multiselect(
-            "Tipo de Veículo:",
-            options=df['Vehicle Type'].unique(),
-            default=df['Vehicle Type'].unique()
+    # Limites e opções vêm do índice de filtros, sem varrer o DataFrame a cada execução
+    filter_index = dataset.index
+    first_day, last_day = from_day_index(filter_index.days[0]), from_day_index(filter_index.days[-1])
+    # Os filtros ficam em um formulário: as alterações são acumuladas e só geram uma nova execução
+    # ao clicar em "Aplicar filtros", em vez de uma execução completa por alteração
+    with st.form("filtros"):
+        date_range = st.date_input(
+            "Selecione o período:",
+            value=(first_day, last_day),
+            min_value=first_day,
+            max_value=last_day
         )
+        
+        col_multi_1, col_multi_2 = st.columns(2)
+
+        with col_multi_1:
+            vehicle_options = list(filter_index.bitmaps['Vehicle Type'])
+            vehicle_types = st.multiselect(
+                "Tipo de Veículo:",
+                options=vehicle_options,
+                default=vehicle_options
+            )
 
-    with col_multi_2:
-        booking_status = st.multiselect(
-            "Status da Reserva:",
-            options=df['Booking Status'].unique(),
-            default=df['Booking Status'].unique()
-        )
+        with col_multi_2:
+            status_options = list(filter_index.bitmaps['Booking Status'])
+            booking_status = st.multiselect(
+                "Status da Reserva:",
+                options=status_options,
+                default=status_options
+            )
+
+        st.form_submit_button("Aplicar filtros")
 
     # Aplicar filtros
     if len(date_range) == 2:
         start_date, end_date = date_range
-        filtered_df = df[
-            (df['Date'].dt.date >= start_date) & 
-            (df['Date'].dt.date <= end_date) &
-            (df['Vehicle Type'].isin(vehicle_types)) &
-            (df['Booking Status'].isin(booking_status))
-        ]
+        day_range = (to_day_index(start_date), to_day_index(end_date))
     else:
-        filtered_df = df[
-            (df['Vehicle Type'].isin(vehicle_types)) &
-            (df['Booking Status'].isin(booking_status))
-        ]
+        day_range = None
+    filtered_rows = select_rows(filter_index, day_range, {
+        'Vehicle Type': vehicle_types,
+        'Booking Status': booking_status,
+    })
+    # Só as duas medidas da dispersão e do box plot são lidas para as linhas filtradas; com um
+    # intervalo de dias sem filtro de categoria, as colunas são apenas visões do dataset
+    points = pd.DataFrame(
+        {col: df[col].to_numpy()[filtered_rows] for col in ['Ride Distance', 'Booking Value']}, copy=False
+    )
+
+    # Agregados por segmento (dia, veículo e status) que atendem aos filtros
+    segments = filter_segments(dataset.aggregates['segments'], day_range, vehicle_types, booking_status)
+    # Contagens por faixa dos histogramas, com os mesmos filtros
+    histograms = filter_segments(dataset.aggregates['histograms'], day_range, vehicle_types, booking_status)
+    # Média, desvio padrão e correlação combinados a partir das somas de cada segmento
+    segment_stats = segment_statistics(segments)
+    # Cubo de contagens dos gráficos, com os mesmos filtros
+    cube = filter_segments(dataset.aggregates['cube'], day_range, vehicle_types, booking_status)
 
     '---'
     # ----------------- KPIs Principais -----------------
@@ -334,24 +632,26 @@ with tab_analise:
 
     col1, col2, col3, col4 = st.columns(4)
 
+    # Os KPIs saem das somas pré-calculadas por segmento, sem percorrer as corridas
+    total_bookings = segment_stats['n']
+
     with col1:
-        total_bookings = len(filtered_df)
         st.metric("Total de Reservas", f"{total_bookings:,}")
 
     with col2:
-        completed_rides = len(filtered_df[filtered_df['Booking Status'] == 'Completed'])
+        completed_rides = segments.loc[segments['Booking Status'] == 'Completed', 'rides'].sum()
         completion_rate = (completed_rides / total_bookings * 100) if total_bookings > 0 else 0
         st.metric("Taxa de Conclusão", f"{completion_rate:.1f}%")
 
     with col3:
-        avg_booking_value = filtered_df['Booking Value'].mean()
+        avg_booking_value = segment_stats['mean_value']
         if not pd.isna(avg_booking_value):
             st.metric("Valor Médio da Reserva", f"₹{avg_booking_value:.2f}")
         else:
             st.metric("Valor Médio da Reserva", "N/A")
 
     with col4:
-        avg_distance = filtered_df['Ride Distance'].mean()
+        avg_distance = segment_stats['mean_distance']
         if not pd.isna(avg_distance):
             st.metric("Distância Média", f"{avg_distance:.2f} km")
         else:
@@ -367,7 +667,7 @@ with tab_analise:
     with col1:
         st.markdown("#### Distribuição do Status das Reservas")
         st.markdown("Este gráfico mostra a proporção de cada status de reserva, permitindo identificar rapidamente o percentual de viagens completadas, canceladas ou incompletas.")
-        status_counts = filtered_df['Booking Status'].value_counts()
+        status_counts = count_by(segments, 'Booking Status')
         fig_status = create_pie_chart(
             status_counts.reset_index(), 
             'count', 
@@ -380,7 +680,7 @@ with tab_analise:
     with col2:
         st.markdown("#### Distribuição por Tipo de Veículo")
         st.markdown("Aqui, visualizamos a participação de mercado de cada tipo de veículo, mostrando quais são os mais populares entre os clientes.")
-        vehicle_counts = filtered_df['Vehicle Type'].value_counts()
+        vehicle_counts = count_by(segments, 'Vehicle Type')
         fig_vehicle = create_bar_chart(
             vehicle_counts.reset_index(), 
             'Vehicle Type', 
@@ -404,8 +704,8 @@ with tab_analise:
     with col1:
         st.markdown("#### Distribuição dos Valores de Reserva")
         st.markdown("Analisar a distribuição dos valores nos permite entender a faixa de preço mais comum das corridas e identificar possíveis outliers (valores muito altos ou baixos).")
-        booking_values = filtered_df.dropna(subset=['Booking Value'])
-        if not booking_values.empty:
+        booking_values = histogram_counts(histograms, 'Booking Value', dataset.histogram_edges['Booking Value'])
+        if booking_values['count'].sum() > 0:
             fig_value = create_histogram(
                 booking_values, 
                 'Booking Value', 
@@ -418,8 +718,8 @@ with tab_analise:
     with col2:
         st.markdown("#### Distribuição das Distâncias das Viagens")
         st.markdown("Da mesma forma, a distribuição das distâncias mostra se as viagens tendem a ser curtas, médias ou longas, um insight valioso para o planejamento de rotas e precificação.")
-        ride_distances = filtered_df.dropna(subset=['Ride Distance'])
-        if not ride_distances.empty:
+        ride_distances = histogram_counts(histograms, 'Ride Distance', dataset.histogram_edges['Ride Distance'])
+        if ride_distances['count'].sum() > 0:
             fig_distance = create_histogram(
                 ride_distances, 
                 'Ride Distance', 
@@ -442,13 +742,12 @@ with tab_analise:
     with col1:
         st.markdown("#### Distribuição das Avaliações dos Motoristas")
         st.markdown("Uma alta concentração de avaliações 5 estrelas sugere que os motoristas estão performando bem. O histograma revela a frequência de cada nota.")
-        driver_ratings = filtered_df.dropna(subset=['Driver Ratings'])
-        if not driver_ratings.empty:
+        driver_ratings = histogram_counts(histograms, 'Driver Ratings', dataset.histogram_edges['Driver Ratings'])
+        if driver_ratings['count'].sum() > 0:
             fig_driver = create_histogram(
                 driver_ratings, 
                 'Driver Ratings', 
-                "",
-                nbins=20
+                ""
             )
             st.plotly_chart(fig_driver, use_container_width=True)
         else:
@@ -457,13 +756,12 @@ with tab_analise:
     with col2:
         st.markdown("#### Distribuição das Avaliações dos Clientes")
         st.markdown("Este gráfico mostra como os motoristas avaliam os clientes. Uma distribuição positiva indica que a experiência de viagem é satisfatória para ambos os lados.")
-        customer_ratings = filtered_df.dropna(subset=['Customer Rating'])
-        if not customer_ratings.empty:
+        customer_ratings = histogram_counts(histograms, 'Customer Rating', dataset.histogram_edges['Customer Rating'])
+        if customer_ratings['count'].sum() > 0:
             fig_customer = create_histogram(
                 customer_ratings, 
                 'Customer Rating', 
-                "",
-                nbins=20
+                ""
             )
             st.plotly_chart(fig_customer, use_container_width=True)
         else:
@@ -484,9 +782,8 @@ with tab_analise:
     with col1:
         st.markdown("#### Razões de Cancelamento por Cliente")
         st.markdown("Este gráfico ajuda a entender por que os clientes estão desistindo de suas reservas. Problemas com o motorista, tempo de espera ou mudanças de planos são algumas das razões comuns.")
-        customer_cancellations = filtered_df.dropna(subset=['Reason for cancelling by Customer'])
-        if not customer_cancellations.empty:
-            cancel_reasons = customer_cancellations['Reason for cancelling by Customer'].value_counts()
+        cancel_reasons = dimension_counts(cube, 'Reason for cancelling by Customer')
+        if not cancel_reasons.empty:
             fig_cancel_customer = create_bar_chart(
                 cancel_reasons.reset_index(), 
                 'Reason for cancelling by Customer', 
@@ -501,9 +798,8 @@ with tab_analise:
     with col2:
         st.markdown("#### Razões de Cancelamento por Motorista")
         st.markdown("A análise das razões de cancelamento por motorista é igualmente importante, pois revela gargalos operacionais, como problemas com o cliente, localização ou logística.")
-        driver_cancellations = filtered_df.dropna(subset=['Driver Cancellation Reason'])
-        if not driver_cancellations.empty:
-            driver_cancel_reasons = driver_cancellations['Driver Cancellation Reason'].value_counts()
+        driver_cancel_reasons = dimension_counts(cube, 'Driver Cancellation Reason')
+        if not driver_cancel_reasons.empty:
             fig_cancel_driver = create_bar_chart(
                 driver_cancel_reasons.reset_index(), 
                 'Driver Cancellation Reason', 
@@ -528,7 +824,9 @@ with tab_analise:
     with col1:
         st.markdown("#### Reservas por Hora do Dia")
         st.markdown("Este gráfico mostra a distribuição de reservas ao longo de um dia. Os picos indicam as horas de maior demanda, como manhãs e finais de tarde.")
-        hourly_bookings = filtered_df.groupby('Hour').size().reset_index(name='count')
+        hourly_counts = dimension_counts(cube, 'Hour')
+        hourly_counts.index = hourly_counts.index.astype(int)
+        hourly_bookings = hourly_counts.sort_index().reset_index()
         fig_hourly = create_bar_chart(
             hourly_bookings, 
             'Hour', 
@@ -540,15 +838,7 @@ with tab_analise:
     with col2:
         st.markdown("#### Tendência Diária de Reservas")
         st.markdown("A série temporal nos permite visualizar a tendência de reservas ao longo dos dias, identificando padrões sazonais ou flutuações anormais.")
-        daily_bookings = filtered_df.groupby(filtered_df['Date'].dt.date).size().reset_index(name='count')
-        daily_bookings.columns = ['Date', 'count']
-        fig_daily = create_time_series(
-            daily_bookings, 
-            'Date', 
-            'count', 
-            ""
-        )
-        st.plotly_chart(fig_daily, use_container_width=True)
+        render_booking_trend(segments, cube, day_range, vehicle_types, booking_status, filter_index.days)
 
     st.subheader("Resumo dos Gráficos 📈")
     st.markdown("É possível entender pelos gráficos que o horário de pico, acontece as (`18:00`), ou seja, entre as 17:00 e 19:00, acontece a maior quantidade de corridas. Alem disso, também enxergamos que os meses com mais corridas acontecendo são (`Janeiro, Novembro e Dezembro`) ")
@@ -564,9 +854,8 @@ with tab_analise:
     with col1:
         st.markdown("#### Distribuição dos Métodos de Pagamento")
         st.markdown("O gráfico de pizza revela qual a preferência dos clientes em relação aos métodos de pagamento, informação crucial para estratégias financeiras.")
-        payment_methods = filtered_df.dropna(subset=['Payment Method'])
-        if not payment_methods.empty:
-            payment_counts = payment_methods['Payment Method'].value_counts()
+        payment_counts = dimension_counts(cube, 'Payment Method')
+        if not payment_counts.empty:
             fig_payment = create_pie_chart(
                 payment_counts.reset_index(), 
                 'count', 
@@ -593,25 +882,23 @@ with tab_analise:
     with col_corr:
         st.markdown("#### Relação entre Valor da Corrida e Distância")
         st.markdown("O gráfico de dispersão mostra se há uma **correlação** entre o valor de uma reserva e a distância percorrida. Uma nuvem de pontos que segue uma linha ascendente indica uma correlação positiva, ou seja, viagens mais longas tendem a ser mais caras.")
-        fig_scatter = px.scatter(
-            filtered_df,
-            x='Ride Distance',
-            y='Booking Value',
-            title='Valor da Reserva vs. Distância da Corrida',
-            color_discrete_sequence=['#2A9D8F']
-        )
-        st.plotly_chart(fig_scatter, use_container_width=True)
+        render_scatter(points)
 
     with col_dist:
         st.markdown("#### Distribuição do Valor da Reserva")
         st.markdown("O boxplot é ideal para visualizar a **dispersão** dos dados. Ele exibe a mediana (linha central), os quartis, e a presença de outliers (pontos isolados), revelando a variação dos valores de reserva.")
-        fig_boxplot = px.box(
-            filtered_df,
-            y='Booking Value',
-            title='Dispersão dos Valores de Reserva',
-            color_discrete_sequence=['#E76F51']
-        )
-        st.plotly_chart(fig_boxplot, use_container_width=True)
+        if not points.empty:
+            value_summary = box_summary(points['Booking Value'].to_numpy())
+            fig_boxplot = create_box_plot(
+                value_summary,
+                'Booking Value',
+                'Dispersão dos Valores de Reserva'
+            )
+            st.plotly_chart(fig_boxplot, use_container_width=True)
+            if value_summary['n_outliers'] > len(value_summary['outliers']):
+                st.caption(f"Exibindo os {len(value_summary['outliers']):,} outliers mais extremos de {value_summary['n_outliers']:,}.")
+        else:
+            st.info("Dados de valor de reserva não disponíveis para o filtro selecionado.")
     
     
     st.subheader("Resumo dos Gráficos 📈")
@@ -625,14 +912,14 @@ with tab_analise:
 
     col5, col6 = st.columns(2)
     with col5:
-        std_dev_value = filtered_df['Booking Value'].std()
+        std_dev_value = segment_stats['std_value']
         if not pd.isna(std_dev_value):
             st.metric("Desvio Padrão (Valor Reserva)", f"₹{std_dev_value:.2f}")
         else:
             st.metric("Desvio Padrão (Valor Reserva)", "N/A")
 
     with col6:
-        correlation = filtered_df['Booking Value'].corr(filtered_df['Ride Distance'])
+        correlation = segment_stats['correlation']
         if not pd.isna(correlation):
             st.metric("Correlação (Valor vs. Distância)", f"{correlation:.2f}")
         else:
@@ -645,7 +932,7 @@ with tab_analise:
     with col2:
         st.markdown("#### Top 10 Localizações de Origem")
         st.markdown("O gráfico de barras mostra as áreas com maior demanda por corridas, permitindo que a empresa aloque mais veículos nessas regiões para otimizar o tempo de espera.")
-        pickup_locations = filtered_df['Pickup Location'].value_counts().head(10)
+        pickup_locations = dimension_counts(cube, 'Pickup Location').head(10)
         fig_pickup = create_bar_chart(
             pickup_locations.reset_index(), 
             'count', 
@@ -669,43 +956,40 @@ with tab_analise:
     """)
 
     # Primeiro, verificamos se o DataFrame filtrado não está vazio
-    if filtered_df.empty:
+    if total_bookings == 0:
         st.warning("O DataFrame filtrado está vazio. Por favor, ajuste as seleções de filtro para ver os resultados.")
     else:
-        # Filtrar os dados para as duas populações de interesse
-        try:
-            completed_distances = filtered_df[filtered_df['Booking Status'] == 'Completed']['Ride Distance'].dropna()
-            
-            cancelled_statuses = ['Cancelled by Customer', 'Cancelled by Driver', 'Incomplete']
-            cancelled_distances = filtered_df[filtered_df['Booking Status'].isin(cancelled_statuses)]['Ride Distance'].dropna()
-
-        except KeyError:
-            st.error("As colunas 'Booking Status' ou 'Ride Distance' não foram encontradas no conjunto de dados. Verifique a ortografia das colunas.")
-            st.stop()
+        # Momentos (n, média, variância) das duas populações, combinados a partir dos segmentos filtrados
+        completed_moments = group_moments(segments, ['Completed'])
+        cancelled_moments = group_moments(segments, CANCELLED_STATUSES)
         
         # Verificamos o tamanho dos grupos de dados
-        if completed_distances.empty or cancelled_distances.empty:
+        if completed_moments[0] == 0 or cancelled_moments[0] == 0:
             st.warning("Dados insuficientes para realizar o teste de hipótese. Para que o teste funcione, por favor, **ajuste o filtro 'Status da Reserva' para incluir tanto 'Completed' quanto pelo menos um tipo de 'Cancelado'**.")
-        elif len(completed_distances) < 2 or len(cancelled_distances) < 2:
+        elif completed_moments[0] < 2 or cancelled_moments[0] < 2:
             st.warning("Os grupos de dados são muito pequenos para realizar uma análise estatística válida. Por favor, ajuste os filtros.")
         else:
-            # T-test e visualização
-            t_stat, p_value = stats.ttest_ind(completed_distances, cancelled_distances, equal_var=False)
+            # Teste T de Welch, IC de 90% e visualização
+            ttest = welch_test(completed_moments, cancelled_moments, confidence=0.9)
+            t_stat, p_value = ttest['t_stat'], ttest['p_value']
+            ci_lower, ci_upper = ttest['ci']
 
             st.markdown("#### **Resultados do Teste T**")
             st.info(f"Estatística T: **{t_stat:.2f}**")
             st.info(f"Valor-p (p-value): **{p_value:.4f}**")
+            st.info(f"Diferença das médias (Completada − Cancelada/Incompleta): **{ttest['difference']:.2f} km** · IC de 90%: **[{ci_lower:.2f}, {ci_upper:.2f}] km**")
 
             st.markdown("#### **Interpretação**")
             if p_value < 0.1:
                 st.success("✅ **Conclusão:** O valor-p é menor que 0.1. **Rejeitamos a Hipótese Nula.** Há uma diferença estatisticamente significativa na distância média entre viagens completadas e canceladas.")
             else:
                 st.warning("❌ **Conclusão:** O valor-p é maior que 0.1. **Não há evidência para rejeitar a Hipótese Nula.** Não podemos afirmar que há uma diferença estatisticamente significativa.")
+            st.markdown("O intervalo de confiança mostra a faixa de valores plausíveis para a diferença real entre as médias; se ele contém o zero, o resultado é coerente com a Hipótese Nula.")
 
             # Visualização para apoiar a interpretação
             mean_distances = pd.DataFrame({
                 'Status': ['Completada', 'Cancelada/Incompleta'],
-                'Distância Média (km)': [completed_distances.mean(), cancelled_distances.mean()]
+                'Distância Média (km)': [completed_moments[1], cancelled_moments[1]]
             })
             fig_ttest_dist = px.bar(
                 mean_distances,
@@ -717,138 +1001,146 @@ with tab_analise:
             )
             st.plotly_chart(fig_ttest_dist, use_container_width=True)
 
+            # Intervalos por bootstrap (não assumem distribuição normal das médias)
+            render_bootstrap(dataset, day_range, vehicle_types, booking_status)
+
     # ----------------- Tabela de Dados -----------------
     st.subheader("Dados Detalhados 📋")
-    st.markdown("A tabela abaixo exibe uma amostra dos dados filtrados. Ela é útil para uma inspeção mais aprofundada das informações que alimentam os gráficos e KPIs.")
-    st.dataframe(
-        filtered_df.head(100), 
-        use_container_width=True,
-        height=400
+    st.markdown("A tabela abaixo exibe os dados filtrados, página por página. Ela é útil para uma inspeção mais aprofundada das informações que alimentam os gráficos e KPIs.")
+    render_table_pages(
+        df, filtered_rows,
+        (dataset.version, day_range, tuple(vehicle_types), tuple(booking_status)),
+        'dados_detalhados'
     )
 
+with tab_analise:
+    if tab_analise.open:
+        render_analysis()
+
 # Tabs para a Pagina de Conclusao
 
 with tab_conclusao:
-    tab_conclusao2, tab_perguntas = st.tabs(["📌 Conclusão Geral", "❓ Perguntas Analisadas"])
-    # Pagina de Conclusao Geral
-    with tab_conclusao2:
-        st.header("5. Conclusão e Insights Principais 🎯")
-        
-        st.markdown("""
-        Com base nas análises realizadas, destacamos os seguintes pontos críticos e padrões observados:
-        """)
+    if tab_conclusao.open:
+        tab_conclusao2, tab_perguntas = st.tabs(["📌 Conclusão Geral", "❓ Perguntas Analisadas"])
+        # Pagina de Conclusao Geral
+        with tab_conclusao2:
+            st.header("5. Conclusão e Insights Principais 🎯")
         
-        # Usando expander para cada item para deixar visual limpo
-        with st.expander("Análise de Desempenho das Corridas"):
-            st.write("""
-            - **38% das corridas não foram concluídas**, indicando alto índice de cancelamentos.
-            - O veículo predominante na Índia é o **Auto**, mostrando preferência consolidada nesse modal.
+            st.markdown("""
+            Com base nas análises realizadas, destacamos os seguintes pontos críticos e padrões observados:
             """)
-
-        with st.expander("Análise de Preço e Duração"):
-            st.write("""
-            - Faixa de preço predominante: **400 a 599 rupias indianas**.
-            - Tempo médio das viagens: **23 a 25 minutos**, indicando padrão estável.
-            """)
-
-        with st.expander("Análise de Avaliações"):
-            st.write("""
-            - Motoristas: **4.2 a 4.3**
-            - Clientes: **4.4 a 4.5**
-            - Indica percepção mais positiva pelos passageiros.
-            """)
-
-        with st.expander("Motivos de Cancelamento"):
-            st.write("""
-            - Clientes: **endereços incorretos**.
-            - Motoristas: **problemas relacionados ao cliente**.
-            - Sugere necessidade de melhorias em geolocalização e confirmação de embarque.
-            """)
-
-        with st.expander("Picos de Demanda"):
-            st.write("""
-            - Horário de pico: **17h às 19h**, com maior concentração às 18h.
-            - Meses mais movimentados: **Janeiro, Novembro e Dezembro**.
-            - Indica sazonalidade e padrões de mobilidade urbana.
-            """)
-
-        with st.expander("Métodos de Pagamento e Origem das Corridas"):
-            st.write("""
-            - Pagamentos mais comuns: **UPI** e **dinheiro**.
-            - Local com mais corridas: **Khandsa**.
-            - Mostra coexistência de meios digitais e tradicionais e consistência nos pontos de origem.
-            """)
-
-        with st.expander("Valor da Corrida vs Distância"):
-            st.write("""
-            - **Correlação fraca** entre distância e valor.
-            - Presença de viagens curtas com valores altos.
-            - Outros fatores (demanda, localização, horário) impactam o preço.
-            """)
-
-        with st.expander("Distância Média: Completadas vs Canceladas"):
-            st.write("""
-            - **Teste T de duas amostras independentes**
-            - Estatística T: 91.93 | Valor-p: 0.0000
-            - **Rejeita-se H₀**, confirmando diferença significativa.
-            - Corridas mais longas possuem maior taxa de conclusão.
-            """)
-
-    # Pagina de Resposta as Perguntas
-    with tab_perguntas:
-        st.header("Respostas Analíticas às Perguntas ❓")
         
-        tabs = st.tabs([
-            "1️⃣ Horários de Pico", 
-            "2️⃣ Motivos de Cancelamento", 
-            "3️⃣ Formas de Pagamento", 
-            "4️⃣ Valor vs Distância", 
-            "5️⃣ Distância Média", 
-            "6️⃣ Fatores do Valor"
-        ])
-
-        # Horários de Pico
-        with tabs[0]:
-            st.write("""
-            O **horário de maior demanda** ocorre por volta das **18h**, dentro do intervalo de 17h às 19h. 
-            Essa tendência está associada ao aumento da mobilidade urbana pós-expediente, devendo ser considerada para otimização de frota e estratégias operacionais.
-            """)
-
-        # Motivos de Cancelamento
-        with tabs[1]:
-            st.write("""
-            - Clientes cancelam principalmente por **endereços incorretos**.
-            - Motoristas cancelam por **problemas relacionados ao cliente**.
-            - Indica necessidade de **melhoria na comunicação e geolocalização**.
-            """)
-
-        # Formas de Pagamento
-        with tabs[2]:
-            st.write("""
-            - **UPI (Unified Payments Interface)** e **Dinheiro** são predominantes.
-            - Reflete coexistência entre meios digitais e físicos, exigindo flexibilidade nos pagamentos.
-            """)
-
-        # Valor vs Distância
-        with tabs[3]:
-            st.write("""
-            - **Correlação fraca** entre distância percorrida e valor.
-            - Outliers indicam viagens curtas com preços elevados.
-            - Fatores como **demanda, horário e localização** influenciam o valor.
-            """)
-
-        # Distância Média
-        with tabs[4]:
-            st.write("""
-            - **Teste T:** estatística T = 91.93, valor-p = 0.0000
-            - Distâncias de viagens completadas são significativamente maiores que das canceladas.
-            - Implica que corridas mais longas têm maior chance de conclusão.
-            """)
-
-        # Fatores do Valor
-        with tabs[5]:
-            st.write("""
-            - Valores das viagens **não se baseiam apenas na distância**.
-            - **Horário, demanda, localização e tipo de veículo** impactam fortemente o preço.
-            - Sistema de tarifação é multifatorial, exigindo maior clareza para percepção de justiça nos preços.
-            """)
\ No newline at end of file
+            # Usando expander para cada item para deixar visual limpo
+            with st.expander("Análise de Desempenho das Corridas"):
+                st.write("""
+                - **38% das corridas não foram concluídas**, indicando alto índice de cancelamentos.
+                - O veículo predominante na Índia é o **Auto**, mostrando preferência consolidada nesse modal.
+                """)
+
+            with st.expander("Análise de Preço e Duração"):
+                st.write("""
+                - Faixa de preço predominante: **400 a 599 rupias indianas**.
+                - Tempo médio das viagens: **23 a 25 minutos**, indicando padrão estável.
+                """)
+
+            with st.expander("Análise de Avaliações"):
+                st.write("""
+                - Motoristas: **4.2 a 4.3**
+                - Clientes: **4.4 a 4.5**
+                - Indica percepção mais positiva pelos passageiros.
+                """)
+
+            with st.expander("Motivos de Cancelamento"):
+                st.write("""
+                - Clientes: **endereços incorretos**.
+                - Motoristas: **problemas relacionados ao cliente**.
+                - Sugere necessidade de melhorias em geolocalização e confirmação de embarque.
+                """)
+
+            with st.expander("Picos de Demanda"):
+                st.write("""
+                - Horário de pico: **17h às 19h**, com maior concentração às 18h.
+                - Meses mais movimentados: **Janeiro, Novembro e Dezembro**.
+                - Indica sazonalidade e padrões de mobilidade urbana.
+                """)
+
+            with st.expander("Métodos de Pagamento e Origem das Corridas"):
+                st.write("""
+                - Pagamentos mais comuns: **UPI** e **dinheiro**.
+                - Local com mais corridas: **Khandsa**.
+                - Mostra coexistência de meios digitais e tradicionais e consistência nos pontos de origem.
+                """)
+
+            with st.expander("Valor da Corrida vs Distância"):
+                st.write("""
+                - **Correlação fraca** entre distância e valor.
+                - Presença de viagens curtas com valores altos.
+                - Outros fatores (demanda, localização, horário) impactam o preço.
+                """)
+
+            with st.expander("Distância Média: Completadas vs Canceladas"):
+                st.write("""
+                - **Teste T de duas amostras independentes**
+                - Estatística T: 91.93 | Valor-p: 0.0000
+                - **Rejeita-se H₀**, confirmando diferença significativa.
+                - Corridas mais longas possuem maior taxa de conclusão.
+                """)
+
+        # Pagina de Resposta as Perguntas
+        with tab_perguntas:
+            st.header("Respostas Analíticas às Perguntas ❓")
+        
+            tabs = st.tabs([
+                "1️⃣ Horários de Pico", 
+                "2️⃣ Motivos de Cancelamento", 
+                "3️⃣ Formas de Pagamento", 
+                "4️⃣ Valor vs Distância", 
+                "5️⃣ Distância Média", 
+                "6️⃣ Fatores do Valor"
+            ])
+
+            # Horários de Pico
+            with tabs[0]:
+                st.write("""
+                O **horário de maior demanda** ocorre por volta das **18h**, dentro do intervalo de 17h às 19h. 
+                Essa tendência está associada ao aumento da mobilidade urbana pós-expediente, devendo ser considerada para otimização de frota e estratégias operacionais.
+                """)
+
+            # Motivos de Cancelamento
+            with tabs[1]:
+                st.write("""
+                - Clientes cancelam principalmente por **endereços incorretos**.
+                - Motoristas cancelam por **problemas relacionados ao cliente**.
+                - Indica necessidade de **melhoria na comunicação e geolocalização**.
+                """)
+
+            # Formas de Pagamento
+            with tabs[2]:
+                st.write("""
+                - **UPI (Unified Payments Interface)** e **Dinheiro** são predominantes.
+                - Reflete coexistência entre meios digitais e físicos, exigindo flexibilidade nos pagamentos.
+                """)
+
+            # Valor vs Distância
+            with tabs[3]:
+                st.write("""
+                - **Correlação fraca** entre distância percorrida e valor.
+                - Outliers indicam viagens curtas com preços elevados.
+                - Fatores como **demanda, horário e localização** influenciam o valor.
+                """)
+
+            # Distância Média
+            with tabs[4]:
+                st.write("""
+                - **Teste T:** estatística T = 91.93, valor-p = 0.0000
+                - Distâncias de viagens completadas são significativamente maiores que das canceladas.
+                - Implica que corridas mais longas têm maior chance de conclusão.
+                """)
+
+            # Fatores do Valor
+            with tabs[5]:
+                st.write("""
+                - Valores das viagens **não se baseiam apenas na distância**.
+                - **Horário, demanda, localização e tipo de veículo** impactam fortemente o preço.
+                - Sistema de tarifação é multifatorial, exigindo maior clareza para percepção de justiça nos preços.
+                """)
\ No newline at end of file
@@ -0,0 +1,13 @@
+"""Fixtures compartilhadas: um dataset pequeno ingerido a partir do início do CSV do repositório."""
+import pandas as pd
+import pytest
+
+from utils.data import DATA_PATH
+from utils.store import load_dataset
+
+
+@pytest.fixture(scope='session')
+def dataset(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp('data')
+    pd.read_csv(DATA_PATH, nrows=3000).to_csv(tmp_path / 'ncr_ride_bookings.csv', index=False)
+    return load_dataset(tmp_path / 'ncr_ride_bookings.csv', tmp_path / '.cache')
@@ -0,0 +1,86 @@
+"""Estatísticas combinadas a partir das somas por segmento, comparadas com o pandas."""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.aggregates import filter_segments, group_moments, segment_statistics
+from utils.index import select_rows
+
+FILTERS = [
+    (None, None, None),
+    (None, ['Go Mini', 'Auto'], None),
+    (None, None, ['Completed']),
+    ('days', ['Go Sedan', 'Bike', 'eBike'], ['Completed', 'Cancelled by Driver', 'Incomplete']),
+]
+
+
+def _filtered(dataset, day_range, vehicle_types, booking_status):
+    if day_range == 'days':
+        days = dataset.index.days
+        day_range = (int(days[len(days) // 4]), int(days[len(days) // 2]))
+    segments = filter_segments(dataset.aggregates['segments'], day_range, vehicle_types, booking_status)
+    filters = {'Vehicle Type': vehicle_types, 'Booking Status': booking_status}
+    rows = dataset.df.iloc[select_rows(dataset.index, day_range, {k: v for k, v in filters.items() if v is not None})]
+    return segments, rows
+
+
+def _segments(values, distances):
+    """Tabela `segments` com um único segmento formado pelas corridas informadas."""
+    values, distances = np.asarray(values, dtype=np.float64), np.asarray(distances, dtype=np.float64)
+    return pd.DataFrame({
+        'Booking Status': ['Completed'], 'rides': [len(values)],
+        'booking_value': [values.sum()], 'ride_distance': [distances.sum()],
+        'booking_value_sq': [(values ** 2).sum()], 'ride_distance_sq': [(distances ** 2).sum()],
+        'value_distance': [(values * distances).sum()],
+    })
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_segment_statistics_match_pandas(dataset, filters):
+    segments, rows = _filtered(dataset, *filters)
+    value, distance = rows['Booking Value'].astype('float64'), rows['Ride Distance'].astype('float64')
+
+    stats = segment_statistics(segments)
+
+    assert stats['n'] == len(rows)
+    assert stats['mean_value'] == pytest.approx(value.mean(), rel=1e-9)
+    assert stats['mean_distance'] == pytest.approx(distance.mean(), rel=1e-9)
+    assert stats['std_value'] == pytest.approx(value.std(), rel=1e-6)
+    assert stats['std_distance'] == pytest.approx(distance.std(), rel=1e-6)
+    assert stats['correlation'] == pytest.approx(value.corr(distance), abs=1e-6)
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_group_moments_match_pandas(dataset, filters):
+    segments, rows = _filtered(dataset, *filters)
+    for statuses in (['Completed'], ['Cancelled by Customer', 'Cancelled by Driver', 'Incomplete']):
+        distance = rows.loc[rows['Booking Status'].isin(statuses), 'Ride Distance'].astype('float64')
+
+        n, mean, variance = group_moments(segments, statuses)
+
+        assert n == len(distance)
+        if n:
+            assert mean == pytest.approx(distance.mean(), rel=1e-9)
+        if n > 1:
+            assert variance == pytest.approx(distance.var(), rel=1e-6)
+
+
+def test_statistics_without_enough_rides():
+    empty = segment_statistics(_segments([], []))
+    assert empty['n'] == 0 and all(math.isnan(empty[key]) for key in empty if key != 'n')
+
+    single = segment_statistics(_segments([100.0], [10.0]))
+    assert single['mean_value'] == 100.0 and single['mean_distance'] == 10.0
+    assert math.isnan(single['std_value']) and math.isnan(single['correlation'])
+    n, mean, variance = group_moments(_segments([100.0], [10.0]), ['Completed'])
+    assert (n, mean) == (1, 10.0) and math.isnan(variance)
+
+
+def test_statistics_with_zero_variance():
+    # Distância constante: desvio padrão zero e correlação indefinida, como no pandas
+    stats = segment_statistics(_segments([100.0, 150.0, 120.0], [12.5, 12.5, 12.5]))
+    assert stats['std_distance'] == 0.0
+    assert math.isnan(stats['correlation'])
+    assert group_moments(_segments([100.0, 150.0], [12.5, 12.5]), ['Completed']) == (2, 12.5, 0.0)
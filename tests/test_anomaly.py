@@ -0,0 +1,83 @@
+"""Detecção incremental de anomalias: estender a série deve dar o mesmo resultado que recalcular tudo."""
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.anomaly import AnomalyDetector
+
+
+def _series(granularity, periods, seed=0):
+    rng = np.random.default_rng(seed)
+    freq = 'h' if granularity == 'hour' else 'D'
+    counts = rng.poisson(200, periods)
+    counts[periods // 2] *= 3
+    return pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=periods, freq=freq), 'count': counts})
+
+
+def _all_scores(granularity, series):
+    # Com limiar negativo todos os pontos são retornados, com o z de cada um
+    return AnomalyDetector(granularity, threshold=-1).update(series)
+
+
+@pytest.mark.parametrize('granularity, periods', [('day', 365), ('hour', 24 * 60)])
+def test_extending_matches_full_recompute(granularity, periods):
+    series = _series(granularity, periods)
+    detector = AnomalyDetector(granularity, threshold=-1)
+
+    for stop in (periods // 5, periods // 5 + 1, periods // 2, periods):
+        result = detector.update(series.iloc[:stop])
+        pd.testing.assert_frame_equal(result, _all_scores(granularity, series.iloc[:stop]))
+
+
+def test_shorter_range_reuses_processed_points():
+    series = _series('day', 300)
+    detector = AnomalyDetector('day', threshold=-1)
+    detector.update(series)
+
+    result = detector.update(series.iloc[:120])
+
+    pd.testing.assert_frame_equal(result, _all_scores('day', series.iloc[:120]))
+    # O histórico completo continua disponível para quem pede o período inteiro
+    pd.testing.assert_frame_equal(detector.update(series), _all_scores('day', series))
+
+
+def test_changed_history_is_recomputed():
+    series = _series('day', 200)
+    detector = AnomalyDetector('day', threshold=-1)
+    detector.update(series)
+
+    corrected = series.assign(count=series['count'] + (series.index == 10))
+    later_start = series.iloc[30:].reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(detector.update(corrected), _all_scores('day', corrected))
+    pd.testing.assert_frame_equal(detector.update(later_start), _all_scores('day', later_start))
+
+
+def test_flags_injected_spike():
+    series = _series('day', 120)
+
+    anomalies = AnomalyDetector('day').update(series)
+
+    assert series['Date'].iloc[60] in set(anomalies['Date'])
+
+
+def test_sessions_with_different_ranges_share_a_detector():
+    series = _series('hour', 24 * 30)
+    detector = AnomalyDetector('hour')
+    expected = {stop: AnomalyDetector('hour').update(series.iloc[:stop]) for stop in (24 * 10, 24 * 20, 24 * 30)}
+    errors = []
+
+    def session(stop):
+        for _ in range(20):
+            result = detector.update(series.iloc[:stop])
+            if not result.equals(expected[stop]):
+                errors.append(stop)
+
+    threads = [threading.Thread(target=session, args=(stop,)) for stop in expected]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
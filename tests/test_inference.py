@@ -0,0 +1,53 @@
+"""Teste t de Welch a partir de momentos agregados, comparado com o `ttest_ind` do scipy."""
+import numpy as np
+import pytest
+from scipy import stats
+
+from utils.aggregates import filter_segments, group_moments
+from utils.index import select_rows
+from utils.inference import welch_test
+
+CANCELLED_STATUSES = ['Cancelled by Customer', 'Cancelled by Driver', 'Incomplete']
+
+
+def _moments(values):
+    values = np.asarray(values, dtype=np.float64)
+    return len(values), values.mean(), values.var(ddof=1) if len(values) > 1 else float('nan')
+
+
+def _assert_matches_scipy(result, first, second, confidence=0.9):
+    expected = stats.ttest_ind(first, second, equal_var=False)
+    interval = expected.confidence_interval(confidence)
+    assert result['t_stat'] == pytest.approx(expected.statistic, rel=1e-6, nan_ok=True)
+    assert result['p_value'] == pytest.approx(expected.pvalue, rel=1e-6, abs=1e-12, nan_ok=True)
+    assert result['dof'] == pytest.approx(expected.df, rel=1e-6, nan_ok=True)
+    assert result['ci'] == pytest.approx((interval.low, interval.high), rel=1e-6, nan_ok=True)
+
+
+@pytest.mark.parametrize('vehicle_types', [None, ['Go Mini', 'Auto'], ['Bike', 'eBike', 'Go Sedan']])
+def test_welch_test_matches_scipy_on_filtered_rows(dataset, vehicle_types):
+    days = dataset.index.days
+    day_range = (int(days[0]), int(days[len(days) // 2]))
+    segments = filter_segments(dataset.aggregates['segments'], day_range, vehicle_types)
+    filters = {} if vehicle_types is None else {'Vehicle Type': vehicle_types}
+    rows = dataset.df.iloc[select_rows(dataset.index, day_range, filters)]
+    distance = rows['Ride Distance'].astype('float64')
+    completed = distance[rows['Booking Status'] == 'Completed'].to_numpy()
+    cancelled = distance[rows['Booking Status'].isin(CANCELLED_STATUSES)].to_numpy()
+
+    result = welch_test(group_moments(segments, ['Completed']), group_moments(segments, CANCELLED_STATUSES))
+
+    _assert_matches_scipy(result, completed, cancelled)
+    assert result['difference'] == pytest.approx(completed.mean() - cancelled.mean(), rel=1e-9)
+
+
+# O scipy avisa sobre os dados degenerados; o resultado (inf/NaN) é o que importa aqui
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+@pytest.mark.parametrize('first, second', [
+    ([3.0, 3.0, 3.0], [5.0, 6.0, 7.0]),  # variância nula em um grupo
+    ([3.0, 3.0, 3.0], [5.0, 5.0]),  # variância nula nos dois grupos
+    ([3.0, 3.0, 3.0], [3.0, 3.0]),  # grupos constantes e iguais
+    ([3.0], [5.0, 6.0, 7.0]),  # grupo com uma única corrida
+])
+def test_welch_test_degenerate_groups(first, second):
+    _assert_matches_scipy(welch_test(_moments(first), _moments(second)), np.array(first), np.array(second))
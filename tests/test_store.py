@@ -0,0 +1,41 @@
+"""Testes do armazenamento incremental com partições adicionais (`utils.store`)."""
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import histogram_counts
+from utils.data import DATA_PATH
+from utils.store import load_dataset
+
+
+def test_small_partition_with_fewer_locations(tmp_path):
+    # A partição principal tem mais de 127 locais (índices int16) e a diária poucos (índices int8)
+    source = pd.read_csv(DATA_PATH, nrows=2028)
+    main, daily = source.iloc[:2000], source.iloc[2000:].assign(Date='2024-12-31')
+    main.to_csv(tmp_path / 'ncr_ride_bookings.csv', index=False)
+    daily.to_csv(tmp_path / 'ncr_ride_bookings_2024-12-31.csv', index=False)
+
+    dataset = load_dataset(tmp_path / 'ncr_ride_bookings.csv', tmp_path / '.cache')
+
+    expected = pd.concat([main, daily]).sort_values('Date', kind='stable')
+    assert len(dataset.df) == len(expected)
+    for col in ['Pickup Location', 'Drop Location']:
+        assert dataset.df[col].astype(str).tolist() == expected[col].tolist()
+
+
+def test_partition_outside_histogram_edges(tmp_path):
+    # A partição diária traz valores acima do máximo da principal: as faixas são ampliadas
+    source = pd.read_csv(DATA_PATH, nrows=2028)
+    main, daily = source.iloc[:2000], source.iloc[2000:].assign(Date='2024-12-31')
+    daily.loc[daily['Booking Value'].notna(), 'Booking Value'] += 10_000
+    main.to_csv(tmp_path / 'ncr_ride_bookings.csv', index=False)
+    load_dataset(tmp_path / 'ncr_ride_bookings.csv', tmp_path / '.cache')
+    daily.to_csv(tmp_path / 'ncr_ride_bookings_2024-12-31.csv', index=False)
+
+    dataset = load_dataset(tmp_path / 'ncr_ride_bookings.csv', tmp_path / '.cache')
+
+    for col, edges in dataset.histogram_edges.items():
+        values = dataset.df[col].to_numpy()
+        assert edges[0] <= values.min() and values.max() <= edges[-1]
+        expected, _ = np.histogram(values, bins=edges)
+        counts = histogram_counts(dataset.aggregates['histograms'], col, edges)['count'].to_numpy()
+        assert counts.tolist() == expected.tolist()
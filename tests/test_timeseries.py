@@ -0,0 +1,58 @@
+"""Redução de séries com o LTTB, comparada com a implementação ponto a ponto do algoritmo."""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.timeseries import downsample, lttb
+
+
+def _reference_lttb(x, y, n_out):
+    """LTTB como descrito por Steinarsson (2013), um ponto por vez."""
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    selected, previous = [0], 0
+    for bucket in range(n_out - 2):
+        avg_start = math.floor((bucket + 1) * every) + 1
+        avg_stop = min(math.floor((bucket + 2) * every) + 1, n)
+        avg_x = sum(x[avg_start:avg_stop]) / (avg_stop - avg_start)
+        avg_y = sum(y[avg_start:avg_stop]) / (avg_stop - avg_start)
+        best, best_area = None, -1.0
+        for i in range(math.floor(bucket * every) + 1, math.floor((bucket + 1) * every) + 1):
+            area = abs((x[previous] - avg_x) * (y[i] - y[previous]) - (x[previous] - x[i]) * (avg_y - y[previous]))
+            if area > best_area:
+                best, best_area = i, area
+        selected.append(best)
+        previous = best
+    return [*selected, n - 1]
+
+
+@pytest.mark.parametrize('n, n_out', [(10, 3), (100, 7), (1000, 50), (5000, 500), (997, 101)])
+def test_lttb_matches_reference(n, n_out):
+    rng = np.random.default_rng(n)
+    x = np.arange(n, dtype=np.float64) * 3600
+    y = rng.poisson(50, n).astype(np.float64)
+
+    selected = lttb(x, y, n_out)
+
+    assert selected.tolist() == _reference_lttb(x.tolist(), y.tolist(), n_out)
+
+
+def test_lttb_keeps_short_series():
+    assert lttb(np.arange(5), np.arange(5), 10).tolist() == [0, 1, 2, 3, 4]
+    assert lttb(np.arange(5), np.arange(5), 2).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_downsample_keeps_extremes():
+    dates = pd.date_range('2024-01-01', periods=8760, freq='h')
+    counts = np.full(len(dates), 40)
+    counts[[1000, 5000]] = [400, 0]
+    series = pd.DataFrame({'Date': dates, 'count': counts})
+
+    reduced = downsample(series, 300)
+
+    assert len(reduced) == 300
+    assert reduced['Date'].is_monotonic_increasing
+    assert reduced['Date'].iloc[0] == dates[0] and reduced['Date'].iloc[-1] == dates[-1]
+    assert {400, 0} <= set(reduced['count'])
@@ -0,0 +1 @@
+"""Funções auxiliares do dashboard (carregamento e tratamento dos dados)."""
@@ -0,0 +1,210 @@
+"""Agregados aditivos por segmento (dia, tipo de veículo e status) mantidos de forma incremental.
+
+Cada tabela guarda somas e contagens; por serem aditivas, os agregados de uma partição nova são
+simplesmente somados aos já existentes, sem reprocessar o histórico. Os gráficos da análise são
+montados a partir dessas tabelas, então o custo de cada atualização depende do número de células
+e não do número de corridas.
+"""
+import numpy as np
+import pandas as pd
+
+SEGMENT_COLS = ['Day Index', 'Vehicle Type', 'Booking Status']
+# Colunas com histograma pré-calculado e o número de faixas usado nos gráficos
+HISTOGRAM_BINS = {'Booking Value': 30, 'Ride Distance': 30, 'Driver Ratings': 20, 'Customer Rating': 20}
+# Dimensões dos gráficos contadas por segmento no cubo (status, veículo e dia já estão em `segments`)
+CUBE_COLS = ['Hour', 'Payment Method', 'Reason for cancelling by Customer', 'Driver Cancellation Reason', 'Pickup Location']
+# Chaves de cada tabela de agregados; as demais colunas são somas
+AGGREGATE_KEYS = {
+    'segments': SEGMENT_COLS,
+    'histograms': [*SEGMENT_COLS, 'Column', 'Bin'],
+    'cube': [*SEGMENT_COLS, 'Column', 'Value'],
+}
+
+
+def to_day_index(date):
+    """Converte uma data para o índice de dia usado na coluna `Day Index` (dias desde 1970-01-01)."""
+    return int(np.datetime64(date, 'D').astype(np.int64))
+
+
+def from_day_index(day_index):
+    """Converte um índice de dia (`Day Index`) de volta para `datetime.date`."""
+    return np.datetime64(int(day_index), 'D').item()
+
+
+def histogram_edges(df, edges=None):
+    """Define as faixas de cada histograma a partir do intervalo de valores de `df`.
+
+    As faixas são definidas na primeira carga e reaproveitadas pelas partições seguintes, para
+    que as contagens continuem somáveis. Com as faixas atuais (`edges`), só as colunas em que
+    `df` sai do intervalo recebem faixas novas, cobrindo os dois intervalos; nesse caso os
+    histogramas já calculados precisam ser refeitos (`compute_histograms`).
+    """
+    result = {}
+    for col, nbins in HISTOGRAM_BINS.items():
+        low, high = float(df[col].min()), float(df[col].max())
+        if edges is not None:
+            if edges[col][0] <= low and high <= edges[col][-1]:
+                result[col] = edges[col]
+                continue
+            low, high = min(low, edges[col][0]), max(high, edges[col][-1])
+        result[col] = np.linspace(low, high, nbins + 1).tolist()
+    return result
+
+
+def _segment_codes(df):
+    """Código do segmento de cada linha de `df` e a tabela com as chaves de cada segmento."""
+    grouped = df.groupby(SEGMENT_COLS, observed=True)
+    keys = grouped.size().index.to_frame(index=False).astype({'Vehicle Type': str, 'Booking Status': str})
+    return grouped.ngroup().to_numpy(), keys
+
+
+def compute_histograms(df, edges, segments=None):
+    """Contagem por faixa de cada coluna de `edges`, por segmento (tabela `histograms`)."""
+    codes, keys = segments or _segment_codes(df)
+    n_groups = len(keys)
+    histograms = []
+    for col, col_edges in edges.items():
+        n_bins = len(col_edges) - 1
+        # O valor máximo cai exatamente no último limite e entra na última faixa
+        bins = np.clip(np.searchsorted(col_edges, df[col].to_numpy(), side='right') - 1, 0, n_bins - 1)
+        counts = np.bincount(codes * n_bins + bins, minlength=n_groups * n_bins)
+        group, bin_ = np.nonzero(counts.reshape(n_groups, n_bins))
+        histograms.append(keys.iloc[group].reset_index(drop=True).assign(
+            Column=col, Bin=bin_, rides=counts.reshape(n_groups, n_bins)[group, bin_],
+        ))
+    return pd.concat(histograms, ignore_index=True)
+
+
+def compute_aggregates(df, edges):
+    """Calcula os agregados de uma partição já tratada.
+
+    - `segments`: número de corridas e as somas de valor (x) e distância (y) por segmento, com
+      Σx², Σy² e Σxy (base das contagens diárias, dos KPIs, do desvio padrão e da correlação);
+    - `histograms`: contagem por faixa de cada coluna de `HISTOGRAM_BINS`, por segmento;
+    - `cube`: contagem por valor de cada coluna de `CUBE_COLS`, por segmento.
+
+    O cubo guarda cada dimensão separadamente (segmento x valor) em vez do cruzamento de todas:
+    os filtros do dashboard só atuam sobre as colunas do segmento, então essas contagens bastam
+    para qualquer gráfico, e o cruzamento completo teria quase uma célula por corrida.
+    """
+    codes, keys = _segment_codes(df)
+    n_groups = len(keys)
+
+    # As somas são acumuladas em float64, mesmo com as colunas armazenadas em float32
+    value = df['Booking Value'].to_numpy(dtype=np.float64)
+    distance = df['Ride Distance'].to_numpy(dtype=np.float64)
+    segments = keys.assign(
+        rides=np.bincount(codes, minlength=n_groups),
+        booking_value=np.bincount(codes, weights=value, minlength=n_groups),
+        ride_distance=np.bincount(codes, weights=distance, minlength=n_groups),
+        booking_value_sq=np.bincount(codes, weights=value * value, minlength=n_groups),
+        ride_distance_sq=np.bincount(codes, weights=distance * distance, minlength=n_groups),
+        value_distance=np.bincount(codes, weights=value * distance, minlength=n_groups),
+    )
+
+    cube = []
+    for col in CUBE_COLS:
+        # Valores ausentes ficam com código -1 e não são contados, como em `value_counts`
+        value_codes, values = pd.factorize(df[col])
+        n_values, valid = len(values), value_codes >= 0
+        counts = np.bincount(codes[valid] * n_values + value_codes[valid], minlength=n_groups * n_values)
+        group, value = np.nonzero(counts.reshape(n_groups, n_values))
+        cube.append(keys.iloc[group].reset_index(drop=True).assign(
+            Column=col, Value=np.asarray(values.astype(str))[value], rides=counts.reshape(n_groups, n_values)[group, value],
+        ))
+    return {
+        'segments': segments,
+        'histograms': compute_histograms(df, edges, (codes, keys)),
+        'cube': pd.concat(cube, ignore_index=True),
+    }
+
+
+def merge_aggregates(total, part):
+    """Soma os agregados de uma partição (`part`) aos agregados acumulados (`total`)."""
+    if total is None:
+        return part
+    return {
+        name: pd.concat([total[name], part[name]]).groupby(AGGREGATE_KEYS[name], as_index=False).sum()
+        for name in part
+    }
+
+
+def filter_segments(table, day_range=None, vehicle_types=None, booking_status=None):
+    """Seleciona as linhas de uma tabela de agregados que atendem aos filtros do dashboard."""
+    mask = pd.Series(True, index=table.index)
+    if day_range is not None:
+        mask &= table['Day Index'].between(*day_range)
+    if vehicle_types is not None:
+        mask &= table['Vehicle Type'].isin(vehicle_types)
+    if booking_status is not None:
+        mask &= table['Booking Status'].isin(booking_status)
+    return table[mask]
+
+
+def segment_statistics(segments):
+    """Média, desvio padrão amostral e correlação de Pearson de valor e distância, a partir das
+    somas de `segments` já filtrado.
+
+    Retorna um dicionário com `n`, `mean_value`, `mean_distance`, `std_value`, `std_distance`
+    e `correlation`; medidas indefinidas (poucas corridas ou variância nula) ficam como NaN.
+    """
+    n = segments['rides'].sum()
+    sums = segments[['booking_value', 'ride_distance', 'booking_value_sq', 'ride_distance_sq', 'value_distance']].sum()
+    stats = dict.fromkeys(['mean_value', 'mean_distance', 'std_value', 'std_distance', 'correlation'], float('nan'))
+    stats['n'] = int(n)
+    if n == 0:
+        return stats
+    stats['mean_value'] = sums['booking_value'] / n
+    stats['mean_distance'] = sums['ride_distance'] / n
+    # Somas dos quadrados dos desvios em relação à média: Σx² - (Σx)²/n
+    ss_value = max(sums['booking_value_sq'] - sums['booking_value'] ** 2 / n, 0.0)
+    ss_distance = max(sums['ride_distance_sq'] - sums['ride_distance'] ** 2 / n, 0.0)
+    cross = sums['value_distance'] - sums['booking_value'] * sums['ride_distance'] / n
+    if n > 1:
+        stats['std_value'] = np.sqrt(ss_value / (n - 1))
+        stats['std_distance'] = np.sqrt(ss_distance / (n - 1))
+    if ss_value > 0 and ss_distance > 0:
+        stats['correlation'] = float(np.clip(cross / np.sqrt(ss_value * ss_distance), -1, 1))
+    return stats
+
+
+def group_moments(segments, booking_status):
+    """Número de corridas, média e variância amostral da distância para um grupo de status.
+
+    Retorna `(n, média, variância)` combinando as somas dos segmentos cujo status está em
+    `booking_status`; média e variância ficam como NaN quando não há corridas suficientes.
+    """
+    group = segments[segments['Booking Status'].isin(booking_status)]
+    n = int(group['rides'].sum())
+    if n == 0:
+        return 0, float('nan'), float('nan')
+    total, total_sq = group['ride_distance'].sum(), group['ride_distance_sq'].sum()
+    variance = max(total_sq - total ** 2 / n, 0.0) / (n - 1) if n > 1 else float('nan')
+    return n, total / n, variance
+
+
+def histogram_counts(histograms, column, edges):
+    """Contagem de corridas em cada faixa de `column` (inclusive as vazias), a partir dos
+    histogramas já filtrados.
+
+    Retorna um DataFrame com o centro (`column`), os limites (`start`, `end`) e a contagem
+    (`count`) de cada faixa.
+    """
+    edges = np.asarray(edges)
+    rides = histograms[histograms['Column'] == column].groupby('Bin')['rides'].sum()
+    counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    counts[rides.index.to_numpy()] = rides.to_numpy()
+    return pd.DataFrame({
+        column: (edges[:-1] + edges[1:]) / 2, 'start': edges[:-1], 'end': edges[1:], 'count': counts,
+    })
+
+
+def count_by(table, key):
+    """Soma as corridas de uma tabela de agregados por `key`, em ordem decrescente (como `value_counts`)."""
+    counts = table.groupby(key, observed=True)['rides'].sum()
+    return counts[counts > 0].sort_values(ascending=False, kind='stable').rename('count')
+
+
+def dimension_counts(cube, column):
+    """Contagem de corridas por valor de uma coluna de `CUBE_COLS`, a partir do cubo já filtrado."""
+    return count_by(cube[cube['Column'] == column].rename(columns={'Value': column}), column)
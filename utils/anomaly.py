@@ -0,0 +1,114 @@
+"""Detecção de anomalias nas séries de reservas (diária e por hora), processadas em fluxo.
+
+Cada ponto é comparado com uma linha de base sazonal (média e desvio dos pontos anteriores no
+mesmo dia da semana, e na mesma hora para a série por hora) ou, enquanto essa base tem poucas
+observações, com a média e a variância móveis (exponenciais) da série. O estado é atualizado em
+O(1) por ponto, então novos dias acrescentados à série são processados sem refazer o histórico.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Pontos com |z| acima desse valor são marcados como anômalos
+Z_THRESHOLD = 3.0
+# Janela efetiva (em pontos) da média e variância móveis exponenciais
+ROLLING_SPAN = 24
+# Observações mínimas de um período sazonal para usar a linha de base sazonal
+MIN_SEASON_OBS = 3
+# Pontos iniciais usados só para aquecer o estado, sem pontuação
+WARMUP_POINTS = 7
+
+
+def _season_slots(timestamps, granularity):
+    """Período sazonal de cada ponto: dia da semana x hora (série por hora) ou dia da semana."""
+    weekday = timestamps.dayofweek.to_numpy()
+    if granularity == 'hour':
+        return weekday * 24 + timestamps.hour.to_numpy(), 7 * 24
+    return weekday, 7
+
+
+class AnomalyDetector:
+    """Detector incremental de anomalias para uma série de `booking_series` (`hour` ou `day`).
+
+    `update()` recebe a série completa, mas só processa os pontos posteriores ao último já visto.
+    Uma série mais curta que coincide com o início do que já foi processado (período que termina
+    antes) reaproveita os pontos existentes; se o trecho já processado mudar (dados corrigidos ou
+    outro início), o estado é refeito.
+    """
+
+    def __init__(self, granularity, threshold=Z_THRESHOLD, span=ROLLING_SPAN):
+        self.granularity = granularity
+        self.threshold = threshold
+        self.alpha = 2 / (span + 1)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        n_slots = _season_slots(pd.DatetimeIndex([]), self.granularity)[1]
+        self._count, self._mean, self._var = 0, 0.0, 0.0
+        self._slot_count = np.zeros(n_slots, dtype=np.int64)
+        self._slot_mean = np.zeros(n_slots)
+        self._slot_m2 = np.zeros(n_slots)
+        self._timestamps = np.array([], dtype='datetime64[ns]')
+        self._values, self._scores = np.array([]), np.array([])
+
+    def _score(self, value, slot):
+        """Pontua um ponto contra o estado atual e depois o incorpora ao estado."""
+        if self._slot_count[slot] >= MIN_SEASON_OBS:
+            baseline = self._slot_mean[slot]
+            spread = np.sqrt(self._slot_m2[slot] / (self._slot_count[slot] - 1))
+        else:
+            baseline, spread = self._mean, np.sqrt(self._var)
+        score = (value - baseline) / max(spread, 1.0) if self._count >= WARMUP_POINTS else 0.0
+
+        # Média e variância móveis exponenciais
+        if self._count == 0:
+            self._mean = value
+        else:
+            delta = value - self._mean
+            self._mean += self.alpha * delta
+            self._var = (1 - self.alpha) * (self._var + self.alpha * delta * delta)
+        self._count += 1
+        # Média e variância do período sazonal (Welford)
+        self._slot_count[slot] += 1
+        delta = value - self._slot_mean[slot]
+        self._slot_mean[slot] += delta / self._slot_count[slot]
+        self._slot_m2[slot] += delta * (value - self._slot_mean[slot])
+        return score
+
+    def _continues(self, series):
+        """Indica se `series` e os pontos já processados coincidem no trecho em comum."""
+        n = min(len(series), len(self._timestamps))
+        return n == 0 or (
+            np.array_equal(series['Date'].to_numpy()[:n], self._timestamps[:n])
+            and np.array_equal(series['count'].to_numpy(dtype=np.float64)[:n], self._values[:n])
+        )
+
+    def update(self, series):
+        """Processa os pontos novos de `series` (colunas `Date` e `count`, em ordem de data) e
+        retorna os anômalos entre os pontos de `series`: DataFrame com `Date`, `count` e `z`.
+
+        O resultado é montado sob o mesmo lock da atualização, então atualizações feitas ao mesmo
+        tempo por outras sessões não alteram os pontos retornados.
+        """
+        with self._lock:
+            if not self._continues(series):
+                self._reset()
+            new = series.iloc[len(self._timestamps):]
+            if not new.empty:
+                timestamps = pd.DatetimeIndex(new['Date'])
+                values = new['count'].to_numpy(dtype=np.float64)
+                slots, _ = _season_slots(timestamps, self.granularity)
+                scores = [self._score(value, slot) for value, slot in zip(values, slots)]
+                self._timestamps = np.concatenate([self._timestamps, timestamps.to_numpy(dtype='datetime64[ns]')])
+                self._values = np.concatenate([self._values, values])
+                self._scores = np.concatenate([self._scores, scores])
+
+            scores = self._scores[:len(series)]
+            flagged = np.flatnonzero(np.abs(scores) > self.threshold)
+            return pd.DataFrame({
+                'Date': pd.DatetimeIndex(self._timestamps[flagged]),
+                'count': self._values[flagged],
+                'z': scores[flagged],
+            })
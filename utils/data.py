@@ -0,0 +1,443 @@
+"""Leitura e pré-processamento de um arquivo de corridas para um artefato colunar (Arrow IPC)."""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+
+DATA_PATH = Path('data/ncr_ride_bookings.csv')
+CACHE_DIR = DATA_PATH.parent / '.cache'
+# Exportações compactadas são aceitas no lugar do CSV; a descompressão é feita em fluxo
+COMPRESSED_SUFFIXES = ['.gz', '.zst', '.bz2']
+# Leitor do CSV: 'pyarrow' (multithread, tipos explícitos) ou 'pandas'
+CSV_ENGINE = os.environ.get('NCR_CSV_ENGINE', 'pyarrow')
+# Linhas por bloco na ingestão em fluxo; o CSV nunca é carregado inteiro na memória
+CHUNK_ROWS = int(os.environ.get('NCR_CHUNK_ROWS', 500_000))
+# Estimativa de bytes por linha do CSV, usada para dimensionar os blocos do leitor do pyarrow
+CSV_ROW_BYTES = 256
+# Versão do pré-processamento; incrementar sempre que o tratamento mudar para invalidar o cache
+CACHE_VERSION = 11
+# Quantidade de linhas do CSV original guardadas no perfil para pré-visualização
+RAW_SAMPLE_ROWS = 1000
+
+NUMERIC_COLS = ['Booking Value', 'Ride Distance', 'Avg VTAT', 'Avg CTAT', 'Cancelled Rides by Customer',
+                'Cancelled Rides by Driver', 'Incomplete Rides', 'Driver Ratings', 'Customer Rating']
+
+# Tipos explícitos para o leitor do pyarrow; data e hora ficam como texto e são convertidas no pré-processamento
+TEXT_COLS = ['Date', 'Time', 'Booking ID', 'Booking Status', 'Customer ID', 'Vehicle Type', 'Pickup Location',
+             'Drop Location', 'Reason for cancelling by Customer', 'Driver Cancellation Reason',
+             'Incomplete Rides Reason', 'Payment Method']
+CSV_COLUMN_TYPES = {**{col: pa.string() for col in TEXT_COLS}, **{col: pa.float64() for col in NUMERIC_COLS}}
+
+# Esquema compacto aplicado ao DataFrame tratado: textos de baixa cardinalidade viram categorias,
+# medidas contínuas viram float32, contagens e a hora viram inteiros pequenos e os IDs usam strings Arrow
+CATEGORY_COLS = ['Vehicle Type', 'Booking Status', 'Pickup Location', 'Drop Location', 'Payment Method',
+                 'Reason for cancelling by Customer', 'Driver Cancellation Reason', 'Incomplete Rides Reason']
+SCHEMA = {
+    'Booking ID': pd.StringDtype('pyarrow'),
+    'Customer ID': pd.StringDtype('pyarrow'),
+    **{col: 'category' for col in CATEGORY_COLS},
+    'Booking Value': 'float32',
+    'Ride Distance': 'float32',
+    'Avg VTAT': 'float32',
+    'Avg CTAT': 'float32',
+    'Driver Ratings': 'float32',
+    'Customer Rating': 'float32',
+    'Cancelled Rides by Customer': 'int8',
+    'Cancelled Rides by Driver': 'int8',
+    'Incomplete Rides': 'int8',
+    'Hour': 'int8',
+    'Day Index': 'int32',
+    'Weekday': 'int8',
+    'Month': 'int8',
+}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Calcula o hash do conteúdo do arquivo lendo-o em blocos, sem carregá-lo inteiro na memória."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_data_file(path=DATA_PATH):
+    """Localiza o CSV de reservas, aceitando também as versões compactadas (`.csv.gz`, `.csv.zst`, ...)."""
+    path = Path(path)
+    for candidate in [path, *(path.with_name(path.name + suffix) for suffix in COMPRESSED_SUFFIXES)]:
+        if candidate.exists():
+            return candidate
+    raise FileNotFoundError(path)
+
+
+def _line_blocks(stream, block_bytes):
+    """Divide o fluxo do CSV em blocos de linhas inteiras com aproximadamente `block_bytes` bytes.
+
+    Os blocos são cortados na última quebra de linha; como o leitor do pyarrow, assume que os
+    valores não contêm quebras de linha (`newlines_in_values=False`).
+    """
+    remainder = b''
+    while data := stream.read(block_bytes):
+        block = remainder + data
+        end = block.rfind(b'\n') + 1
+        remainder = block[end:]
+        if end:
+            yield block[:end]
+    if remainder.strip():
+        yield remainder
+
+
+def iter_csv_chunks(path, engine=CSV_ENGINE, chunk_rows=CHUNK_ROWS):
+    """Lê o CSV de reservas (compactado ou não) em blocos de aproximadamente `chunk_rows` linhas.
+
+    Com `engine='pyarrow'` cada bloco de linhas é lido com `pa_csv.read_csv`, que o divide entre
+    todos os núcleos, usando os tipos de `CSV_COLUMN_TYPES` (o leitor em fluxo `open_csv` usaria
+    uma única thread); com `engine='pandas'` as colunas numéricas chegam como vierem no arquivo
+    e são convertidas com `errors='coerce'` no pré-processamento.
+    """
+    if engine == 'pyarrow':
+        convert_options = pa_csv.ConvertOptions(column_types=CSV_COLUMN_TYPES, strings_can_be_null=True)
+        with pa.input_stream(str(path), compression='detect') as stream:
+            read_options = None
+            for block in _line_blocks(stream, chunk_rows * CSV_ROW_BYTES):
+                if read_options is None:
+                    # O cabeçalho vem no primeiro bloco; os seguintes recebem os nomes das colunas
+                    header_end = block.find(b'\n') + 1 or len(block)
+                    header = pa_csv.read_csv(pa.BufferReader(block[:header_end]))
+                    read_options = pa_csv.ReadOptions(use_threads=True, column_names=header.column_names)
+                    block = block[header_end:]
+                    if not block.strip():
+                        continue
+                table = pa_csv.read_csv(pa.BufferReader(block), read_options=read_options, convert_options=convert_options)
+                yield table.to_pandas()
+    else:
+        # A descompressão também fica com o pyarrow, que lê `.zst` sem depender do pacote `zstandard`
+        text_types = {col: 'str' for col in TEXT_COLS}
+        with pa.input_stream(str(path), compression='detect') as stream, \
+                pd.read_csv(stream, dtype=text_types, chunksize=chunk_rows) as reader:
+            yield from reader
+
+
+def update_raw_profile(profile, chunk, sample_rows=RAW_SAMPLE_ROWS):
+    """Acumula em `profile` o resumo de mais um bloco do CSV bruto, para a comparação "antes".
+
+    O perfil guarda contagem de nulos, tipos e uso de memória por coluna e as primeiras
+    `sample_rows` linhas, sem manter uma cópia dos dados brutos.
+    """
+    if not profile:
+        profile.update({
+            'rows': 0,
+            'null_counts': dict.fromkeys(chunk.columns, 0),
+            'dtypes': chunk.dtypes.astype(str).to_dict(),
+            'memory_usage': dict.fromkeys(chunk.columns, 0),
+            'head': {col: [] for col in chunk.columns},
+        })
+    missing_rows = sample_rows - profile['rows']
+    if missing_rows > 0:
+        for col, values in chunk.head(missing_rows).to_dict(orient='list').items():
+            profile['head'][col].extend(values)
+    profile['rows'] += len(chunk)
+    for col, count in chunk.isnull().sum().items():
+        profile['null_counts'][col] += int(count)
+    for col, nbytes in chunk.memory_usage(index=False, deep=True).items():
+        profile['memory_usage'][col] += int(nbytes)
+    return profile
+
+
+def table_profile(table):
+    """Resumo de uma tabela tratada (Arrow) no mesmo formato do perfil bruto, para a comparação "depois".
+
+    Contagens de nulos e tamanhos vêm dos metadados das colunas Arrow, sem percorrer os valores.
+    """
+    dtypes = table.schema.empty_table().to_pandas().dtypes.astype(str)
+    return {
+        'rows': table.num_rows,
+        'null_counts': {name: table.column(name).null_count for name in table.column_names},
+        'dtypes': {name: dtypes[name] for name in table.column_names},
+        'memory_usage': {name: table.column(name).nbytes for name in table.column_names},
+    }
+
+
+def merge_profiles(profiles):
+    """Combina os perfis de vários arquivos em um único perfil (a amostra, se houver, vem do primeiro)."""
+    first = profiles[0]
+    merged = {
+        'rows': sum(profile['rows'] for profile in profiles),
+        'null_counts': {col: sum(profile['null_counts'].get(col, 0) for profile in profiles) for col in first['null_counts']},
+        'dtypes': first['dtypes'],
+        'memory_usage': {col: sum(profile['memory_usage'].get(col, 0) for profile in profiles) for col in first['memory_usage']},
+    }
+    if 'head' in first:
+        merged['head'] = first['head']
+    merged['info'] = format_info(merged)
+    return merged
+
+
+def format_info(profile):
+    """Monta a partir do perfil um resumo no formato de `DataFrame.info()`."""
+    rows, dtypes = profile['rows'], profile['dtypes']
+    width = max(len('Column'), *map(len, dtypes))
+    count_width = max(len('Non-Null Count'), len(f'{rows} non-null'))
+    lines = [
+        f'RangeIndex: {rows} entries, 0 to {rows - 1}',
+        f'Data columns (total {len(dtypes)} columns):',
+        f" #   {'Column':<{width}}  {'Non-Null Count':<{count_width}}  Dtype",
+        f"---  {'-' * 6:<{width}}  {'-' * 14:<{count_width}}  -----",
+    ]
+    for i, (col, dtype) in enumerate(dtypes.items()):
+        non_null = f"{rows - profile['null_counts'][col]} non-null"
+        lines.append(f' {i:<3} {col:<{width}}  {non_null:<{count_width}}  {dtype}')
+    dtype_counts = pd.Series(dtypes).value_counts().sort_index()
+    lines.append('dtypes: ' + ', '.join(f'{dtype}({count})' for dtype, count in dtype_counts.items()))
+    lines.append(f"memory usage: {sum(profile['memory_usage'].values()) / 2**20:.1f} MB")
+    return '\n'.join(lines)
+
+
+def convert_types(df, coerced=None):
+    """Converte as colunas de data, hora e numéricas de um bloco bruto, sem preencher ausentes.
+
+    Se `coerced` for informado, acumula nele, por coluna convertida, quantos valores presentes no
+    bruto eram inválidos e viraram nulos na conversão.
+    """
+    # Conversão de tipos de dados para garantir que os cálculos funcionem.
+    # Há poucas datas e horários distintos, então cada valor distinto é convertido uma única vez.
+    sources = {'Date': df['Date'], 'Hour': df['Time']}
+    converted = {
+        'Date': decode_unique(df['Date'], lambda values: pd.to_datetime(values, errors='coerce')),
+        'Hour': decode_unique(df['Time'], lambda values: pd.to_datetime(values, format='%H:%M:%S', errors='coerce').hour),
+    }
+
+    # Tratar colunas numéricas que podem estar como string
+    for col in NUMERIC_COLS:
+        if col in df.columns:
+            sources[col] = df[col]
+            converted[col] = pd.to_numeric(df[col], errors='coerce')
+
+    for col, values in converted.items():
+        if coerced is not None:
+            coerced[col] = coerced.get(col, 0) + int((sources[col].notna() & values.isna()).sum())
+        df[col] = values
+    return df
+
+
+def finalize_chunk(df, fill_values, categories):
+    """Preenche os ausentes de um bloco convertido, deriva o calendário e aplica o esquema compacto."""
+    # Preencher valores ausentes para evitar erros nos gráficos e métricas
+    df, _ = impute(df, fill_values)
+    return apply_schema(add_calendar_columns(df), categories)
+
+
+def decode_unique(values, parse):
+    """Aplica `parse` uma vez por valor distinto de `values` e replica o resultado para as linhas.
+
+    `parse` recebe os valores distintos e devolve um resultado de mesmo tamanho; linhas nulas
+    na entrada ficam nulas na saída.
+    """
+    codes, uniques = pd.factorize(values)
+    # A posição extra (ausente) atende aos códigos -1 que o factorize atribui aos nulos
+    parsed = pd.Series(parse(uniques)).reindex(range(len(uniques) + 1))
+    return pd.Series(parsed.to_numpy()[codes], index=values.index)
+
+
+def add_calendar_columns(df):
+    """Deriva da coluna `Date` o índice do dia (dias desde 1970-01-01), o dia da semana e o mês."""
+    codes, uniques = pd.factorize(df['Date'])
+    uniques = pd.DatetimeIndex(uniques)
+    df['Day Index'] = uniques.values.astype('datetime64[D]').astype(np.int32)[codes]
+    df['Weekday'] = uniques.weekday.to_numpy(np.int8)[codes]
+    df['Month'] = uniques.month.to_numpy(np.int8)[codes]
+    return df
+
+
+def compute_fill_values(df):
+    """Calcula o valor de preenchimento de cada coluna com ausentes: mediana para numéricas, moda para as demais."""
+    null_counts = df.isna().sum()
+    missing = null_counts.index[null_counts > 0]
+    numeric = [col for col in missing if pd.api.types.is_numeric_dtype(df[col])]
+    other = [col for col in missing if col not in numeric]
+
+    fill_values = {}
+    if numeric:
+        fill_values.update(df[numeric].median().to_dict())
+    if other:
+        fill_values.update(df[other].mode().iloc[0].to_dict())
+    return fill_values
+
+
+def impute(df, fill_values=None):
+    """Preenche os ausentes de todas as colunas em uma única atribuição.
+
+    Se `fill_values` for informado (ex.: valores já gravados no cache), ele é reaproveitado
+    em vez de recalcular as estatísticas.
+    """
+    if fill_values is None:
+        fill_values = compute_fill_values(df)
+    else:
+        # Datas reaproveitadas de um manifesto JSON chegam como texto
+        fill_values = {
+            col: pd.Timestamp(value) if col in df.columns and pd.api.types.is_datetime64_any_dtype(df[col]) else value
+            for col, value in fill_values.items()
+        }
+    return df.fillna(fill_values), fill_values
+
+
+def apply_schema(df, categories=None):
+    """Converte as colunas do DataFrame tratado para os tipos compactos definidos em `SCHEMA`.
+
+    `categories` fixa as categorias de cada coluna categórica, garantindo o mesmo dicionário em
+    todos os blocos de um artefato.
+    """
+    dtypes = {col: dtype for col, dtype in SCHEMA.items() if col in df.columns}
+    for col, values in (categories or {}).items():
+        dtypes[col] = pd.CategoricalDtype(values)
+    return df.astype(dtypes)
+
+
+def column_statistics(table, fill_values=None):
+    """Calcula sobre a tabela convertida os valores de preenchimento e as categorias de cada coluna.
+
+    Valores de preenchimento já conhecidos (`fill_values`) são reaproveitados; só as colunas com
+    ausentes que ainda não têm valor são calculadas. As colunas são lidas uma de cada vez, então
+    basta memória para uma coluna por vez.
+    """
+    fill_values = dict(fill_values or {})
+    for col in table.column_names:
+        if table[col].null_count and col not in fill_values:
+            fill_values.update(compute_fill_values(table.select([col]).to_pandas()))
+    categories = {}
+    for col in CATEGORY_COLS:
+        if col in table.column_names:
+            values = set(pc.unique(table[col]).drop_null().to_pylist())
+            if col in fill_values:
+                values.add(fill_values[col])
+            categories[col] = sorted(values)
+    return fill_values, categories
+
+
+def _write_batches(chunks, path):
+    """Grava os DataFrames de `chunks` como lotes sucessivos de um arquivo Arrow IPC."""
+    writer = schema = None
+    try:
+        for chunk in chunks:
+            # O esquema do primeiro bloco vale para os seguintes, que são convertidos para ele
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = pa.ipc.new_file(str(path), schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _open_batches(path):
+    """Abre mapeado em memória um arquivo gravado por `_write_batches`."""
+    return pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+
+
+def _profiled(chunks, profile):
+    """Repassa os blocos brutos, acumulando cada um no perfil dos dados brutos."""
+    for chunk in chunks:
+        update_raw_profile(profile, chunk)
+        yield chunk
+
+
+def sort_by_day(table):
+    """Ordena a tabela tratada pela coluna `Day Index` (ordenação estável).
+
+    Com as linhas em ordem de dia, um intervalo de datas vira uma faixa contínua de linhas
+    (ver `utils.index`).
+    """
+    return table.sort_by([('Day Index', 'ascending')])
+
+
+def write_table(table, path, metadata=None):
+    """Grava a tabela em Arrow IPC de forma atômica (arquivo temporário + rename).
+
+    `metadata` é um dicionário serializável em JSON guardado junto ao esquema do arquivo.
+    """
+    # Colunas de texto com armazenamento Arrow chegam fragmentadas; unifica tudo antes de gravar
+    table = table.combine_chunks()
+    if metadata is not None:
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b'ncr.metadata': json.dumps(metadata, default=str).encode(),
+        })
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    # Sem compressão e em um único lote: cada coluna fica contígua no arquivo e pode ser
+    # mapeada em memória sem cópia (com vários lotes o pandas precisaria concatená-los)
+    feather.write_feather(table, tmp_path, compression='uncompressed', chunksize=max(len(table), 1))
+    os.replace(tmp_path, path)
+
+
+def read_metadata(path):
+    """Lê apenas os metadados de um artefato gravado por `write_table`, sem carregar as colunas."""
+    with pa.memory_map(str(path)) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    return json.loads(metadata.get(b'ncr.metadata', b'{}'))
+
+
+def read_artifact(path):
+    """Lê um artefato gravado por `write_table`, retornando (df, metadata).
+
+    O arquivo é mapeado em memória e convertido com `split_blocks=True`, de modo que as colunas
+    numéricas e de datas reaproveitam as páginas do próprio arquivo sem cópia. Todos os processos
+    que abrem o mesmo artefato compartilham essas páginas pelo cache do sistema operacional.
+    """
+    table = feather.read_table(path, memory_map=True)
+    metadata = json.loads((table.schema.metadata or {}).get(b'ncr.metadata', b'{}'))
+    return table.to_pandas(split_blocks=True), metadata
+
+
+def build_artifact(csv_path, path, fill_values=None, engine=CSV_ENGINE, chunk_rows=CHUNK_ROWS):
+    """Processa o CSV em blocos e grava em `path` o artefato tratado, retornando seus metadados.
+
+    1. Cada bloco bruto é resumido no perfil, convertido e gravado num arquivo intermediário.
+    2. Valores de preenchimento e categorias são calculados coluna a coluna sobre esse arquivo.
+    3. Cada bloco intermediário é preenchido, recebe o esquema compacto e segue para o artefato.
+
+    O CSV nunca é materializado inteiro em memória; apenas o resultado compacto é unificado
+    no final, ordenado por dia (`sort_by_day`) e gravado em um único lote. Se um valor numérico
+    inválido interromper a leitura pelo pyarrow, o arquivo é processado novamente com o leitor
+    do pandas.
+
+    Os metadados formam o relatório do pré-processamento: perfil bruto e tratado (nulos, tipos e
+    memória), valores de preenchimento e quantidade de valores inválidos por conversão.
+    """
+    path = Path(path)
+    staging_path = path.with_name(f'{path.name}.{os.getpid()}.stage')
+    final_path = path.with_name(f'{path.name}.{os.getpid()}.final')
+    try:
+        raw_profile, coerced_counts = {}, {}
+        try:
+            chunks = _profiled(iter_csv_chunks(csv_path, engine, chunk_rows), raw_profile)
+            _write_batches((convert_types(chunk, coerced_counts) for chunk in chunks), staging_path)
+        except pa.ArrowInvalid:
+            if engine != 'pyarrow':
+                raise
+            return build_artifact(csv_path, path, fill_values, 'pandas', chunk_rows)
+        raw_profile['info'] = format_info(raw_profile)
+
+        staging = _open_batches(staging_path)
+        fill_values, categories = column_statistics(staging, fill_values)
+        _write_batches((finalize_chunk(batch.to_pandas(), fill_values, categories) for batch in staging.to_batches()), final_path)
+
+        table = sort_by_day(_open_batches(final_path))
+        metadata = {
+            'raw_profile': raw_profile,
+            'processed_profile': table_profile(table),
+            'fill_values': fill_values,
+            'coerced_counts': coerced_counts,
+        }
+        write_table(table, path, metadata)
+        return metadata
+    finally:
+        for tmp in (staging_path, final_path):
+            tmp.unlink(missing_ok=True)
@@ -0,0 +1,85 @@
+"""Índice de filtros do dashboard: faixas de linhas por dia e bitmaps por categoria.
+
+O dataset é gravado ordenado por `Day Index`, então cada dia ocupa uma faixa contínua de linhas
+e um intervalo de datas é encontrado com uma busca binária. Para cada valor de `Vehicle Type` e
+`Booking Status` há um bitmap compactado (1 bit por linha); os filtros de categoria viram OR
+entre os bitmaps dos valores escolhidos e AND entre as colunas, aplicados só à faixa de dias.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+BITMAP_COLS = ['Vehicle Type', 'Booking Status']
+
+
+@dataclass(frozen=True)
+class FilterIndex:
+    """Índice somente leitura construído uma vez por versão do dataset."""
+    # Dias distintos em ordem crescente e a linha onde cada um começa (com o total de linhas no fim)
+    days: np.ndarray
+    day_offsets: np.ndarray
+    # Coluna -> valor -> bitmap compactado com `np.packbits`
+    bitmaps: dict
+
+
+def build_filter_index(df):
+    """Constrói o índice a partir do DataFrame tratado, que deve estar ordenado por `Day Index`."""
+    days, starts = np.unique(df['Day Index'].to_numpy(), return_index=True)
+    bitmaps = {}
+    for col in BITMAP_COLS:
+        codes = df[col].cat.codes.to_numpy()
+        bitmaps[col] = {
+            value: np.packbits(codes == code)
+            for code, value in enumerate(df[col].cat.categories)
+        }
+    return FilterIndex(days, np.append(starts, len(df)), bitmaps)
+
+
+def day_bounds(index, day_range=None):
+    """Converte um intervalo de dias (inclusivo) na faixa de linhas [início, fim)."""
+    if day_range is None:
+        return 0, int(index.day_offsets[-1])
+    first = np.searchsorted(index.days, day_range[0], side='left')
+    last = np.searchsorted(index.days, day_range[1], side='right')
+    return int(index.day_offsets[first]), int(index.day_offsets[last])
+
+
+def select_rows(index, day_range=None, filters=None):
+    """Retorna as linhas que atendem aos filtros.
+
+    O resultado é um `slice` quando só o intervalo de datas restringe as linhas, ou um array de
+    posições quando algum filtro de categoria exclui valores.
+    """
+    start, stop = day_bounds(index, day_range)
+    byte_start, byte_stop = start // 8, (stop + 7) // 8
+    combined = None
+    for col, values in (filters or {}).items():
+        col_bitmaps = index.bitmaps[col]
+        # Todos os valores selecionados: o filtro não exclui nenhuma linha
+        if set(col_bitmaps) <= set(values):
+            continue
+        selected = np.zeros(byte_stop - byte_start, dtype=np.uint8)
+        for value in values:
+            if value in col_bitmaps:
+                selected |= col_bitmaps[value][byte_start:byte_stop]
+        combined = selected if combined is None else combined & selected
+    if combined is None:
+        return slice(start, stop)
+    bits = np.unpackbits(combined, count=stop - byte_start * 8)[start - byte_start * 8:]
+    return start + np.flatnonzero(bits)
+
+
+def row_positions(rows, n_rows):
+    """Converte o resultado de `select_rows` (`slice` ou array) em um array de posições."""
+    return np.arange(n_rows)[rows] if isinstance(rows, slice) else np.asarray(rows)
+
+
+def sorted_positions(df, rows, column, ascending=True):
+    """Posições das linhas selecionadas (`rows`) ordenadas por `column`, com valores ausentes no fim.
+
+    A ordenação é estável; colunas categóricas seguem a ordem das categorias.
+    """
+    positions = row_positions(rows, len(df))
+    values = df[column].take(positions).reset_index(drop=True)
+    order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+    return positions[order]
@@ -0,0 +1,182 @@
+"""Testes estatísticos do dashboard.
+
+O teste t de Welch é calculado a partir de momentos já agregados (n, média, variância). O
+bootstrap reamostra as distâncias em lotes (matrizes de índices) distribuídos entre processos,
+com sementes derivadas de uma semente fixa para que o resultado seja reprodutível. Os processos
+ficam num pool reaproveitado entre os cálculos, e as amostras de cada cálculo são gravadas uma
+única vez num arquivo mapeado em memória pelos processos; cada tarefa recebe só o caminho, o
+número de reamostragens e a semente.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from scipy import stats
+
+# Processos usados no bootstrap (1 = sem paralelismo)
+BOOTSTRAP_WORKERS = int(os.environ.get('NCR_BOOTSTRAP_WORKERS', os.cpu_count() or 1))
+# Reamostragens por tarefa; fixo para que o resultado não dependa do número de processos
+RESAMPLES_PER_TASK = 500
+# Máximo de índices sorteados de uma vez (limita a memória de cada lote)
+BATCH_ELEMENTS = 4_000_000
+BOOTSTRAP_SEED = 42
+# Abaixo desse total de índices sorteados, iniciar os processos custa mais do que o cálculo
+PARALLEL_MIN_ELEMENTS = 50_000_000
+# O servidor do Streamlit usa várias threads, então os processos não são criados com `fork`
+POOL_CONTEXT = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Pool de processos compartilhado: `(workers, executor)`, criado no primeiro cálculo paralelo
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _shared_executor(workers):
+    """Retorna o pool de processos com `workers` processos, criando-o apenas na primeira vez."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool[0] != workers:
+            if _pool is not None:
+                _pool[1].shutdown(wait=False, cancel_futures=True)
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(POOL_CONTEXT))
+            _pool = (workers, executor)
+        return _pool[1]
+
+
+def _discard_executor(executor):
+    """Descarta um pool quebrado (ex.: processo encerrado pelo sistema); o próximo cálculo cria outro."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool[1] is executor:
+            _pool = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def welch_test(first, second, confidence=0.9):
+    """Teste t de Welch (variâncias diferentes) e intervalo de confiança para a diferença das médias.
+
+    `first` e `second` são tuplas `(n, média, variância)`, como as de `group_moments`. Retorna um
+    dicionário com `t_stat`, `p_value`, `dof`, `difference` (média de `first` menos a de
+    `second`) e `ci` (limites inferior e superior do intervalo).
+    """
+    (n1, mean1, var1), (n2, mean2, var2) = first, second
+    # Casos degenerados (variância nula ou indefinida) resultam em inf/NaN, como no `ttest_ind` do scipy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_stat, p_value = stats.ttest_ind_from_stats(
+            mean1, np.sqrt(var1), n1, mean2, np.sqrt(var2), n2, equal_var=False,
+        )
+        # Erro padrão da diferença e graus de liberdade de Welch-Satterthwaite
+        se1, se2 = np.float64(var1) / n1, np.float64(var2) / n2
+        std_error = np.sqrt(se1 + se2)
+        dof = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+    # Graus de liberdade indefinidos (sem variância nos dois grupos) valem 1, como no scipy
+    dof = 1.0 if np.isnan(dof) else dof
+    difference = mean1 - mean2
+    margin = stats.t.ppf((1 + confidence) / 2, dof) * std_error
+    return {
+        't_stat': float(t_stat),
+        'p_value': float(p_value),
+        'dof': float(dof),
+        'difference': float(difference),
+        'ci': (float(difference - margin), float(difference + margin)),
+    }
+
+
+def _resample_means(samples, n_resamples, seed):
+    """Médias de `n_resamples` reamostragens com reposição de `samples`, sorteadas em lotes."""
+    rng = np.random.default_rng(seed)
+    n = len(samples)
+    batch_size = max(1, BATCH_ELEMENTS // n)
+    means = np.empty(n_resamples)
+    for start in range(0, n_resamples, batch_size):
+        stop = min(start + batch_size, n_resamples)
+        # Cada linha da matriz é uma reamostragem
+        indices = rng.integers(0, n, size=(stop - start, n))
+        means[start:stop] = samples[indices].mean(axis=1)
+    return means
+
+
+def _resample_file_means(path, n_resamples, seed):
+    """`_resample_means` sobre as amostras gravadas em `path`, mapeadas em memória (sem cópia entre processos)."""
+    return _resample_means(np.load(path, mmap_mode='r'), n_resamples, seed)
+
+
+def _bootstrap_means(samples, n_resamples, seed_sequence, executor, on_task_done):
+    """Divide as reamostragens em tarefas de tamanho fixo, cada uma com sua própria semente.
+
+    Sem `executor`, `samples` é o array de valores; com ele, é o caminho do arquivo `.npy` com os
+    valores, lido pelos processos do pool.
+    """
+    sizes = [min(RESAMPLES_PER_TASK, n_resamples - start) for start in range(0, n_resamples, RESAMPLES_PER_TASK)]
+    seeds = seed_sequence.spawn(len(sizes))
+    parts = []
+    if executor is None:
+        for size, seed in zip(sizes, seeds):
+            parts.append(_resample_means(samples, size, seed))
+            on_task_done()
+    else:
+        futures = [executor.submit(_resample_file_means, samples, size, seed) for size, seed in zip(sizes, seeds)]
+        try:
+            # Os resultados são lidos na ordem de envio, então não dependem de qual processo termina antes
+            for future in futures:
+                parts.append(future.result())
+                on_task_done()
+        finally:
+            # Se o cálculo for interrompido, as tarefas ainda não iniciadas são canceladas; o pool continua
+            for future in futures:
+                future.cancel()
+    return np.concatenate(parts)
+
+
+def bootstrap_means(groups, n_resamples=10_000, confidence=0.9, seed=BOOTSTRAP_SEED, workers=BOOTSTRAP_WORKERS,
+                    progress=None):
+    """Intervalos de confiança por percentis (bootstrap) para as médias de dois grupos e sua diferença.
+
+    `groups` é um dicionário `{nome: valores}` com exatamente dois grupos; a diferença é a média
+    do primeiro menos a do segundo. Cada grupo é reamostrado de forma independente. Retorna
+    `{nome: (inferior, superior)}` para cada grupo e para `'difference'`.
+
+    `progress`, se informado, é chamado com a fração concluída (0 a 1) após cada tarefa. Uma
+    exceção lançada por ele interrompe o cálculo e cancela as tarefas ainda não iniciadas.
+    """
+    (first, first_values), (second, second_values) = groups.items()
+    first_values = np.asarray(first_values, dtype=np.float64)
+    second_values = np.asarray(second_values, dtype=np.float64)
+    first_seed, second_seed = np.random.SeedSequence(seed).spawn(2)
+    tail = (1 - confidence) / 2 * 100
+    n_tasks = 2 * -(-n_resamples // RESAMPLES_PER_TASK)
+    done = 0
+
+    def on_task_done():
+        nonlocal done
+        done += 1
+        if progress is not None:
+            progress(done / n_tasks)
+
+    if workers > 1 and n_resamples * (len(first_values) + len(second_values)) >= PARALLEL_MIN_ELEMENTS:
+        executor = _shared_executor(workers)
+        samples_dir = tempfile.mkdtemp(prefix='ncr-bootstrap-')
+        try:
+            first_path, second_path = os.path.join(samples_dir, 'first.npy'), os.path.join(samples_dir, 'second.npy')
+            np.save(first_path, first_values)
+            np.save(second_path, second_values)
+            first_means = _bootstrap_means(first_path, n_resamples, first_seed, executor, on_task_done)
+            second_means = _bootstrap_means(second_path, n_resamples, second_seed, executor, on_task_done)
+        except BrokenProcessPool:
+            _discard_executor(executor)
+            raise
+        finally:
+            # Processos ainda lendo os arquivos mantêm o mapeamento; falhas na remoção são ignoradas
+            shutil.rmtree(samples_dir, ignore_errors=True)
+    else:
+        first_means = _bootstrap_means(first_values, n_resamples, first_seed, None, on_task_done)
+        second_means = _bootstrap_means(second_values, n_resamples, second_seed, None, on_task_done)
+
+    return {
+        name: tuple(float(q) for q in np.percentile(means, [tail, 100 - tail]))
+        for name, means in ((first, first_means), (second, second_means), ('difference', first_means - second_means))
+    }
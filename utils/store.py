@@ -0,0 +1,367 @@
+"""Armazenamento incremental do dataset: partições, agregados e o artefato combinado.
+
+O CSV principal (`data/ncr_ride_bookings.csv`) é a primeira partição; exportações diárias
+colocadas ao lado dele como `data/ncr_ride_bookings_<sufixo>.csv` (compactadas ou não) são
+partições adicionais. Cada partição é processada uma única vez para seu próprio artefato, e os
+agregados acumulados recebem apenas a contribuição das partições novas. O `manifest.json` em
+`data/.cache` registra o que já foi ingerido.
+
+`DatasetStore` mantém o dataset em uso e o recarrega em segundo plano quando os arquivos mudam.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import suppress
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from utils.aggregates import AGGREGATE_KEYS, compute_aggregates, compute_histograms, histogram_edges, merge_aggregates
+from utils.data import (CACHE_DIR, CACHE_VERSION, COMPRESSED_SUFFIXES, DATA_PATH, build_artifact, file_hash,
+                        find_data_file, merge_profiles, read_artifact, read_metadata, sort_by_day, write_table)
+from utils.index import FilterIndex, build_filter_index
+
+MANIFEST_NAME = 'manifest.json'
+PARTITIONS_DIR = 'partitions'
+
+
+@dataclass(frozen=True)
+class PreprocessingReport:
+    """Relatório do pré-processamento, gerado na ingestão e somado entre as partições.
+
+    Os perfis (`rows`, `null_counts`, `dtypes`, `memory_usage` e o texto `info`) descrevem os
+    dados antes e depois do tratamento; `coerced_counts` conta, por coluna convertida, os valores
+    inválidos que viraram nulos.
+    """
+    raw_profile: dict
+    processed_profile: dict
+    fill_values: dict
+    coerced_counts: dict
+
+
+def build_report(artifacts, fill_values):
+    """Monta o `PreprocessingReport` a partir dos metadados dos artefatos, sem ler os dados."""
+    metadata = [read_metadata(a) for a in artifacts]
+    coerced_counts = {}
+    for entry in metadata:
+        for col, count in entry['coerced_counts'].items():
+            coerced_counts[col] = coerced_counts.get(col, 0) + count
+    return PreprocessingReport(
+        merge_profiles([entry['raw_profile'] for entry in metadata]),
+        merge_profiles([entry['processed_profile'] for entry in metadata]),
+        fill_values,
+        coerced_counts,
+    )
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Dataset tratado e seus metadados, compartilhado entre as sessões.
+
+    O DataFrame é somente leitura: as colunas numéricas apontam diretamente para o artefato
+    mapeado em memória, então nenhuma sessão deve alterá-lo no lugar.
+    """
+    df: pd.DataFrame
+    report: PreprocessingReport
+    aggregates: dict
+    # Identifica o conjunto de partições; muda sempre que o conteúdo dos dados muda
+    version: str
+    index: FilterIndex
+    # Limites das faixas dos histogramas pré-calculados (`HISTOGRAM_BINS`)
+    histogram_edges: dict
+
+
+def find_partitions(path=DATA_PATH):
+    """Lista o arquivo principal seguido das partições adicionais, em ordem de nome."""
+    path = Path(path)
+    stem = path.name.split('.csv')[0]
+    suffixes = ('.csv', *(f'.csv{suffix}' for suffix in COMPRESSED_SUFFIXES))
+    extra = sorted(p for p in path.parent.glob(f'{stem}_*.csv*') if p.name.endswith(suffixes))
+    return [find_data_file(path), *extra]
+
+
+def file_stats(partitions):
+    """Assinatura barata dos arquivos (nome, tamanho e data de modificação), sem ler o conteúdo."""
+    return tuple((p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in partitions)
+
+
+def _remove(path):
+    """Remove um arquivo que não é mais usado; falhas (ex.: arquivo ainda aberto no Windows) são ignoradas."""
+    with suppress(OSError):
+        path.unlink(missing_ok=True)
+
+
+def _empty_manifest():
+    return {'version': CACHE_VERSION, 'generation': 0, 'partitions': [], 'fill_values': {}, 'histogram_edges': None}
+
+
+def _read_manifest(cache_dir):
+    try:
+        return json.loads((cache_dir / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return _empty_manifest()
+
+
+def _write_manifest(manifest, cache_dir):
+    """Grava o manifesto de forma atômica; ele só aponta para agregados já gravados por completo."""
+    tmp_path = cache_dir / f'{MANIFEST_NAME}.{os.getpid()}.tmp'
+    tmp_path.write_text(json.dumps(manifest, indent=2, default=str))
+    os.replace(tmp_path, cache_dir / MANIFEST_NAME)
+
+
+def _aggregate_path(cache_dir, generation, name):
+    return cache_dir / f'aggregates-{generation}-{name}.arrow'
+
+
+def _read_aggregates(cache_dir, manifest):
+    if not manifest['partitions']:
+        return None
+    return {
+        name: feather.read_feather(_aggregate_path(cache_dir, manifest['generation'], name))
+        for name in AGGREGATE_KEYS
+    }
+
+
+def _is_valid(manifest, partitions, hashes):
+    """Um manifesto continua válido se as partições já ingeridas não mudaram nem sumiram."""
+    if manifest.get('version') != CACHE_VERSION:
+        return False
+    ingested = manifest['partitions']
+    if ingested and ingested[0]['source'] != partitions[0].name:
+        return False
+    return all(hashes.get(entry['source']) == entry['hash'] for entry in ingested)
+
+
+def _partition_hashes(partitions, manifest):
+    """Calcula o hash do conteúdo de cada partição.
+
+    Arquivos com o mesmo tamanho e data de modificação registrados no manifesto reaproveitam o
+    hash já conhecido; só os demais são lidos para confirmar se o conteúdo mudou de fato.
+    """
+    known = {entry['source']: entry for entry in manifest['partitions']}
+    hashes = {}
+    for partition in partitions:
+        stat, entry = partition.stat(), known.get(partition.name, {})
+        if (entry.get('size'), entry.get('mtime_ns')) == (stat.st_size, stat.st_mtime_ns):
+            hashes[partition.name] = entry['hash']
+        else:
+            hashes[partition.name] = file_hash(partition)
+    return hashes
+
+
+def _update_stats(manifest, partitions):
+    """Registra tamanho e data de modificação das partições; retorna True se algo mudou."""
+    stats = {p.name: p.stat() for p in partitions}
+    changed = False
+    for entry in manifest['partitions']:
+        stat = stats[entry['source']]
+        if (entry.get('size'), entry.get('mtime_ns')) != (stat.st_size, stat.st_mtime_ns):
+            entry['size'], entry['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+            changed = True
+    return changed
+
+
+def _rebuild_histograms(manifest, partitions_dir, edges):
+    """Recalcula a tabela `histograms` das partições já ingeridas com as faixas `edges`."""
+    histograms = None
+    for entry in manifest['partitions']:
+        df, _ = read_artifact(partitions_dir / entry['artifact'])
+        part = {'histograms': compute_histograms(df, edges)}
+        histograms = merge_aggregates(histograms, part)
+    return histograms['histograms']
+
+
+def sync_store(partitions, cache_dir=CACHE_DIR):
+    """Ingere as partições ainda não processadas e atualiza os agregados; retorna (manifest, aggregates).
+
+    Partições novas são tratadas com os valores de preenchimento já registrados e somadas aos
+    agregados existentes; se trouxerem valores fora das faixas dos histogramas, as faixas são
+    ampliadas e só os histogramas são refeitos. Se uma partição já ingerida mudar ou for
+    removida, tudo é refeito.
+    """
+    manifest = _read_manifest(cache_dir)
+    hashes = _partition_hashes(partitions, manifest)
+    if not _is_valid(manifest, partitions, hashes):
+        manifest = _empty_manifest()
+    aggregates = _read_aggregates(cache_dir, manifest)
+    ingested = {entry['source'] for entry in manifest['partitions']}
+    new_partitions = [p for p in partitions if p.name not in ingested]
+    if not new_partitions:
+        # Arquivo "tocado" sem mudar o conteúdo: só atualiza a assinatura para não refazer o hash
+        if _update_stats(manifest, partitions):
+            _write_manifest(manifest, cache_dir)
+        return manifest, aggregates
+
+    partitions_dir = cache_dir / PARTITIONS_DIR
+    partitions_dir.mkdir(parents=True, exist_ok=True)
+    for partition in new_partitions:
+        name = partition.name.split('.csv')[0]
+        artifact = partitions_dir / f'{name}-{hashes[partition.name]}-v{CACHE_VERSION}.arrow'
+        metadata = build_artifact(partition, artifact, manifest['fill_values'])
+        manifest['fill_values'] = {**metadata['fill_values'], **manifest['fill_values']}
+
+        df, _ = read_artifact(artifact)
+        edges = histogram_edges(df, manifest['histogram_edges'])
+        if manifest['histogram_edges'] is not None and edges != manifest['histogram_edges']:
+            # Valores fora das faixas atuais: os histogramas das partições já ingeridas são
+            # refeitos com as faixas ampliadas a partir dos artefatos, sem reler os CSVs
+            aggregates = {**aggregates, 'histograms': _rebuild_histograms(manifest, partitions_dir, edges)}
+        manifest['histogram_edges'] = edges
+        aggregates = merge_aggregates(aggregates, compute_aggregates(df, edges))
+        manifest['partitions'].append({'source': partition.name, 'hash': hashes[partition.name], 'artifact': artifact.name})
+
+    _update_stats(manifest, partitions)
+    previous_generation = manifest['generation']
+    manifest['generation'] += 1
+    for name, table in aggregates.items():
+        write_table(pa.Table.from_pandas(table, preserve_index=False), _aggregate_path(cache_dir, manifest['generation'], name))
+    _write_manifest(manifest, cache_dir)
+
+    # Limpeza do que não é mais referenciado pelo manifesto
+    # Sessões ainda servidas pela versão anterior mantêm seus arquivos mapeados em memória
+    for name in aggregates:
+        _remove(_aggregate_path(cache_dir, previous_generation, name))
+    referenced = {entry['artifact'] for entry in manifest['partitions']}
+    for old in partitions_dir.glob('*.arrow'):
+        if old.name not in referenced:
+            _remove(old)
+    return manifest, aggregates
+
+
+def _index_type(size):
+    """Menor tipo inteiro de índice de dicionário que comporta `size` categorias (como os códigos do pandas)."""
+    for index_type in (pa.int8(), pa.int16(), pa.int32()):
+        if size <= np.iinfo(index_type.to_pandas_dtype()).max:
+            return index_type
+    return pa.int64()
+
+
+def concat_partitions(tables):
+    """Concatena as tabelas das partições em uma só, com um único dicionário por coluna categórica.
+
+    Cada partição tem suas próprias categorias, e o tipo dos índices (int8, int16, ...) depende de
+    quantas são; por isso as colunas categóricas são concatenadas com índices int32 e, depois de
+    unificados os dicionários, voltam ao menor tipo que comporta o dicionário resultante.
+    """
+    def with_index(field, index_type):
+        return field.with_type(pa.dictionary(index_type, field.type.value_type, field.type.ordered))
+
+    schema = tables[0].schema
+    dictionary_cols = [field.name for field in schema if pa.types.is_dictionary(field.type)]
+    wide = pa.schema(
+        [with_index(field, pa.int32()) if field.name in dictionary_cols else field for field in schema], schema.metadata,
+    )
+    table = pa.concat_tables([t.select(schema.names).cast(wide) for t in tables]).unify_dictionaries()
+    narrow = pa.schema([
+        with_index(field, _index_type(len(table.column(field.name).chunk(0).dictionary)))
+        if field.name in dictionary_cols and table.column(field.name).num_chunks else field
+        for field in wide
+    ], schema.metadata)
+    return table.cast(narrow)
+
+
+def _combined_artifact(artifacts, version, cache_dir):
+    """Une os artefatos das partições em um único artefato contíguo, para a leitura sem cópia.
+
+    A união só lê tabelas já tratadas (sem reprocessar CSV) e é refeita apenas quando o
+    conjunto de partições muda.
+    """
+    path = cache_dir / f'dataset-{version}.arrow'
+    if not path.exists():
+        tables = [feather.read_table(a, memory_map=True) for a in artifacts]
+        write_table(sort_by_day(concat_partitions(tables)), path)
+        for old in cache_dir.glob('dataset-*.arrow'):
+            if old != path:
+                _remove(old)
+    return path
+
+
+def usable_cache_dir(cache_dir=CACHE_DIR):
+    """Cria `cache_dir` se preciso e o retorna; sem permissão de escrita, retorna uma pasta temporária nova."""
+    cache_dir = Path(cache_dir)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        writable = os.access(cache_dir, os.W_OK)
+    except OSError:
+        writable = False
+    if not writable:
+        # Sem permissão de escrita em `data/`, o armazenamento vive numa pasta temporária
+        cache_dir = Path(tempfile.mkdtemp(prefix='ncr-'))
+    return cache_dir
+
+
+def load_dataset(data_path=DATA_PATH, cache_dir=CACHE_DIR):
+    """Sincroniza o armazenamento com os arquivos em `data/` e retorna o `Dataset` atual."""
+    partitions = find_partitions(data_path)
+    cache_dir = usable_cache_dir(cache_dir)
+
+    manifest, aggregates = sync_store(partitions, cache_dir)
+    artifacts = [cache_dir / PARTITIONS_DIR / entry['artifact'] for entry in manifest['partitions']]
+    version = hashlib.blake2b(''.join(a.name for a in artifacts).encode(), digest_size=16).hexdigest()
+    path = artifacts[0] if len(artifacts) == 1 else _combined_artifact(artifacts, version, cache_dir)
+
+    df, _ = read_artifact(path)
+    report = build_report(artifacts, manifest['fill_values'])
+    return Dataset(df, report, aggregates, version, build_filter_index(df), manifest['histogram_edges'])
+
+
+class DatasetStore:
+    """Mantém o `Dataset` em uso e o substitui em segundo plano quando os arquivos de `data/` mudam.
+
+    A cada execução do script, `current()` compara só tamanho e data de modificação dos arquivos.
+    Se algo mudou, uma thread confirma a mudança pelo hash do conteúdo (`sync_store`), refaz os
+    artefatos necessários e troca o dataset de uma vez; até lá as sessões continuam recebendo a
+    versão anterior.
+
+    A pasta do armazenamento é definida uma única vez: se for preciso usar uma pasta temporária,
+    as recargas seguintes reaproveitam a mesma e só processam o que mudou.
+    """
+
+    def __init__(self, data_path=DATA_PATH, cache_dir=CACHE_DIR):
+        self.data_path = data_path
+        self.cache_dir = usable_cache_dir(cache_dir)
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._dataset = None
+        self._stats = None
+        self._reload_thread = None
+
+    def current(self):
+        """Retorna o dataset atual, disparando a recarga em segundo plano se os arquivos mudaram."""
+        with self._lock:
+            if self._dataset is None:
+                # Primeira carga: não há versão anterior para servir, então é feita na hora
+                self._stats = file_stats(find_partitions(self.data_path))
+                self._dataset = load_dataset(self.data_path, self.cache_dir)
+                return self._dataset
+
+            try:
+                stats = file_stats(find_partitions(self.data_path))
+            except FileNotFoundError:
+                # Arquivo principal sendo substituído: continua servindo a versão carregada
+                return self._dataset
+            reloading = self._reload_thread is not None and self._reload_thread.is_alive()
+            if stats != self._stats and not reloading:
+                self._reload_thread = threading.Thread(target=self._reload, args=(stats,), daemon=True)
+                self._reload_thread.start()
+            return self._dataset
+
+    def _reload(self, stats):
+        try:
+            dataset = load_dataset(self.data_path, self.cache_dir)
+        except Exception as e:
+            # Mantém a versão anterior; uma nova tentativa só ocorre quando os arquivos mudarem de novo
+            with self._lock:
+                self._stats, self.last_error = stats, e
+            return
+        with self._lock:
+            # Arquivos apenas "tocados" geram a mesma versão: o objeto atual (e seus caches) é mantido
+            if dataset.version != self._dataset.version:
+                self._dataset = dataset
+            self._stats, self.last_error = stats, None
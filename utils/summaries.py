@@ -0,0 +1,104 @@
+"""Resumos das corridas filtradas calculados no servidor para gráficos com muitos pontos.
+
+Em vez de enviar todas as linhas ao navegador, os gráficos recebem uma grade de densidade, uma
+amostra estratificada ou quartis, sempre acompanhados dos outliers (limitados em quantidade).
+"""
+import numpy as np
+
+# Número de faixas por eixo da grade usada na densidade e na estratificação da amostra
+GRID_BINS = 60
+# Máximo de outliers enviados a um gráfico
+MAX_OUTLIERS = 2000
+SAMPLE_SEED = 42
+
+
+def tukey_fences(values):
+    """Quartis e cercas de Tukey (1,5 x IQR) de `values`.
+
+    Retorna `(q1, mediana, q3, cerca_inferior, cerca_superior)`.
+    """
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    return q1, median, q3, q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def outlier_positions(df, columns, max_outliers=MAX_OUTLIERS):
+    """Posições das linhas fora das cercas de Tukey em alguma das `columns`.
+
+    Quando há mais que `max_outliers`, ficam os mais extremos (maior distância até a cerca,
+    medida em IQRs).
+    """
+    score = np.zeros(len(df))
+    for col in columns:
+        values = df[col].to_numpy(dtype=np.float64)
+        q1, _, q3, lower, upper = tukey_fences(values)
+        iqr = (q3 - q1) or 1.0
+        score = np.maximum(score, np.maximum(lower - values, values - upper) / iqr)
+    positions = np.flatnonzero(score > 0)
+    if len(positions) > max_outliers:
+        positions = np.sort(positions[np.argpartition(score[positions], -max_outliers)[-max_outliers:]])
+    return positions
+
+
+def box_summary(values, max_outliers=MAX_OUTLIERS):
+    """Estatísticas de um box plot: quartis, bigodes, média e outliers (os mais extremos, até `max_outliers`).
+
+    Os bigodes vão até o valor mais distante ainda dentro das cercas de Tukey, como no box plot
+    do Plotly.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    q1, median, q3, lower, upper = tukey_fences(values)
+    is_outlier = (values < lower) | (values > upper)
+    inside, outliers = values[~is_outlier], values[is_outlier]
+    if len(outliers) > max_outliers:
+        distance = np.maximum(lower - outliers, outliers - upper)
+        outliers = outliers[np.argpartition(distance, -max_outliers)[-max_outliers:]]
+    return {
+        'q1': q1, 'median': median, 'q3': q3, 'mean': values.mean(),
+        'lower_whisker': inside.min(), 'upper_whisker': inside.max(),
+        'outliers': np.sort(outliers), 'n_outliers': int(is_outlier.sum()),
+    }
+
+
+def _grid_edges(values, bins):
+    low, high = values.min(), values.max()
+    return np.linspace(low, high if high > low else low + 1, bins + 1)
+
+
+def density_grid(df, x, y, bins=GRID_BINS):
+    """Contagem de corridas em uma grade 2D de `x` por `y`.
+
+    Retorna `(contagens, centros_x, centros_y)`, com as contagens no formato (faixas de y,
+    faixas de x) esperado pelo heatmap do Plotly.
+    """
+    x_values, y_values = df[x].to_numpy(dtype=np.float64), df[y].to_numpy(dtype=np.float64)
+    counts, x_edges, y_edges = np.histogram2d(
+        x_values, y_values, bins=[_grid_edges(x_values, bins), _grid_edges(y_values, bins)],
+    )
+    return counts.T, (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2
+
+
+def stratified_sample(df, x, y, max_points, bins=GRID_BINS, seed=SAMPLE_SEED):
+    """Posições de uma amostra de até ~`max_points` linhas estratificada pela grade de `x` por `y`.
+
+    Cada célula contribui proporcionalmente ao seu tamanho, com ao menos uma linha, para que
+    regiões esparsas do gráfico continuem representadas. A semente fixa mantém a mesma amostra
+    entre execuções.
+    """
+    n = len(df)
+    if n <= max_points:
+        return np.arange(n)
+    cells = np.zeros(n, dtype=np.int64)
+    for col in (x, y):
+        values = df[col].to_numpy(dtype=np.float64)
+        edges = _grid_edges(values, bins)
+        cells = cells * bins + np.clip(np.searchsorted(edges, values, side='right') - 1, 0, bins - 1)
+
+    # Ordem aleatória dentro de cada célula; as primeiras `cota` linhas de cada célula são mantidas
+    order = np.random.default_rng(seed).permutation(n)
+    order = order[np.argsort(cells[order], kind='stable')]
+    sorted_cells = cells[order]
+    _, starts, sizes = np.unique(sorted_cells, return_index=True, return_counts=True)
+    quotas = np.maximum(1, np.floor(sizes * max_points / n)).astype(np.int64)
+    rank = np.arange(n) - np.repeat(starts, sizes)
+    return np.sort(order[rank < np.repeat(quotas, sizes)])
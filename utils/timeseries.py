@@ -0,0 +1,92 @@
+"""Séries temporais de reservas montadas a partir dos agregados, em várias granularidades.
+
+As contagens por hora vêm do cubo (dimensão `Hour` por dia) e as diárias dos segmentos; semanas
+e meses são somas das diárias. Períodos sem corridas entram com contagem zero. Séries longas são
+reduzidas com o LTTB (Largest-Triangle-Three-Buckets), que preserva o formato visual da linha.
+"""
+import numpy as np
+import pandas as pd
+
+GRANULARITIES = {'hour': 'Hora', 'day': 'Dia', 'week': 'Semana', 'month': 'Mês'}
+# Maior intervalo (em dias) exibido em cada granularidade quando a escolha é automática
+AUTO_GRANULARITY_DAYS = [('hour', 7), ('day', 366), ('week', 3 * 366)]
+# Máximo de pontos enviados ao gráfico de tendência
+MAX_TREND_POINTS = 500
+
+
+def choose_granularity(n_days):
+    """Escolhe a granularidade da série a partir do tamanho do intervalo selecionado."""
+    for granularity, max_days in AUTO_GRANULARITY_DAYS:
+        if n_days <= max_days:
+            return granularity
+    return 'month'
+
+
+def _day_counts(segments):
+    counts = segments.groupby('Day Index')['rides'].sum()
+    days = np.arange(counts.index.min(), counts.index.max() + 1)
+    return pd.Series(
+        counts.reindex(days, fill_value=0).to_numpy(), index=pd.to_datetime(days, unit='D'), name='count',
+    )
+
+
+def _hour_counts(cube):
+    hours = cube[cube['Column'] == 'Hour']
+    counts = hours.groupby([hours['Day Index'], hours['Value'].astype(int)])['rides'].sum()
+    day_index, hour = counts.index.get_level_values(0), counts.index.get_level_values(1)
+    timestamps = pd.to_datetime(day_index.to_numpy().astype(np.int64) * 24 + hour.to_numpy(), unit='h')
+    series = pd.Series(counts.to_numpy(), index=timestamps, name='count').sort_index()
+    return series.reindex(pd.date_range(series.index.min(), series.index.max(), freq='h'), fill_value=0)
+
+
+def booking_series(segments, cube, granularity):
+    """Número de reservas por período (`hour`, `day`, `week` ou `month`) para os agregados já filtrados.
+
+    Retorna um DataFrame com as colunas `Date` (início do período) e `count`.
+    """
+    if segments['rides'].sum() == 0:
+        return pd.DataFrame({'Date': pd.to_datetime([]), 'count': np.array([], dtype=np.int64)})
+    if granularity == 'hour':
+        series = _hour_counts(cube)
+    else:
+        series = _day_counts(segments)
+        if granularity == 'week':
+            series = series.resample('W-MON', label='left', closed='left').sum()
+        elif granularity == 'month':
+            series = series.resample('MS').sum()
+    return series.rename_axis('Date').reset_index()
+
+
+def lttb(x, y, n_out):
+    """Índices dos pontos mantidos pelo LTTB ao reduzir a série (`x`, `y`) para `n_out` pontos.
+
+    O primeiro e o último ponto são sempre mantidos; de cada faixa intermediária fica o ponto que
+    forma o maior triângulo com o ponto escolhido na faixa anterior e a média da faixa seguinte.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    bounds = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, stop = bounds[bucket], bounds[bucket + 1]
+        next_stop = bounds[bucket + 2] if bucket + 2 < len(bounds) else n
+        next_x, next_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample(series, max_points=MAX_TREND_POINTS):
+    """Reduz uma série de `booking_series` para no máximo `max_points` pontos com o LTTB."""
+    if len(series) <= max_points:
+        return series
+    x = series['Date'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    return series.iloc[lttb(x, series['count'].to_numpy(), max_points)]